@@ -0,0 +1,5 @@
+"""Offline benchmarks for the send loop, group sync and UI log path.
+
+Run from the repository root, e.g. `python -m benchmarks.bench_sender --groups 10000`.
+No Telegram account is needed; a FakeTelegramClient stands in for Telethon.
+"""
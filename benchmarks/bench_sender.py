@@ -0,0 +1,204 @@
+"""Throughput and latency benchmark for group sync, the send loop and the UI log path.
+
+    python -m benchmarks.bench_sender --groups 100000 --latency-ms 2 --error-rate 0.01
+
+Everything runs against FakeTelegramClient inside a temporary directory, so the
+group index, job journal and log file never touch the real ones. The pacing floor
+is lowered to --min-interval (0 by default) so the numbers show engine overhead
+rather than the deliberate spacing between messages.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from telegram_sender import GroupIndex, LOG_DRAIN_INTERVAL_MS, LogSink, SendJob, SenderEngine, get_groups_async, send_message_to_groups
+from telegram_sender import pacing
+
+from .fake_client import FakeTelegramClient
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it can't be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class UIDrainer(threading.Thread):
+    """Drains a LogSink on the same tick as the GUI and counts the Tk work it would do."""
+    def __init__(self, sink):
+        super().__init__(name="ui-drainer", daemon=True)
+        self.sink = sink
+        self.ticks = 0
+        self.textbox_inserts = 0
+        self.label_updates = 0
+        self.lines = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(LOG_DRAIN_INTERVAL_MS / 1000):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        lines, sent = self.sink.drain()
+        self.ticks += 1
+        if lines:
+            self.textbox_inserts += 1
+            self.lines += len(lines)
+        if sent:
+            self.label_updates += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+async def bench_group_sync(engine, phone_number):
+    group_index = GroupIndex(phone_number)
+    calls_before = engine.client.api_calls
+    started = time.perf_counter()
+    groups = await get_groups_async(engine, group_index, full=True)
+    full_seconds = time.perf_counter() - started
+    full_calls = engine.client.api_calls - calls_before
+
+    calls_before = engine.client.api_calls
+    started = time.perf_counter()
+    await get_groups_async(engine, GroupIndex(phone_number).load())
+    incremental_seconds = time.perf_counter() - started
+
+    return groups, {
+        "groups": len(groups),
+        "full_sync_seconds": round(full_seconds, 3),
+        "full_sync_api_calls": full_calls,
+        "incremental_sync_seconds": round(incremental_seconds, 3),
+        "incremental_sync_api_calls": engine.client.api_calls - calls_before,
+    }
+
+async def bench_send(engine, phone_number, groups, sink):
+    job = SendJob.create(phone_number, "Benchmark message", 0, groups)
+    drainer = UIDrainer(sink)
+    drainer.start()
+    client = engine.client
+    started = time.perf_counter()
+    await send_message_to_groups(engine, job)
+    elapsed = time.perf_counter() - started
+    drainer.stop()
+
+    sent = sum(1 for status in job.status.values() if status == "sent")
+    latencies_ms = [s * 1000 for s in client.send_latencies]
+    non_sent_lines = max(drainer.lines - sent, 0)
+    return {
+        "targets": len(groups),
+        "sent": sent,
+        "send_calls": len(client.send_latencies),
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(sent / elapsed, 1) if elapsed else None,
+        "send_latency_p50_ms": round(percentile(latencies_ms, 50), 3),
+        "send_latency_p99_ms": round(percentile(latencies_ms, 99), 3),
+        "errors": dict(client.errors),
+        "ui_events": engine.events,
+        "ui_ticks": drainer.ticks,
+        "ui_textbox_inserts": drainer.textbox_inserts,
+        "ui_label_updates": drainer.label_updates,
+        # Before the log sink, every sent message cost two Tk callbacks and every other line one.
+        "ui_callbacks_unbatched": sent * 2 + non_sent_lines,
+    }
+
+async def run(args):
+    client = FakeTelegramClient(
+        groups=args.groups,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        flood_rate=args.flood_rate,
+        flood_seconds=args.flood_seconds,
+        slow_mode_rate=args.slow_mode_rate,
+        slow_mode_seconds=args.slow_mode_seconds,
+        seed=args.seed,
+    )
+    sink = LogSink()
+
+    def on_event(kind, data):
+        engine.events += 1
+        if kind == "log":
+            sink.log(data["text"])
+        elif kind == "sent":
+            sink.count_sent()
+
+    engine = SenderEngine(on_event=on_event)
+    engine.events = 0
+    engine.client = client
+    phone_number = "+10000000000"
+    try:
+        groups, sync_result = await bench_group_sync(engine, phone_number)
+        send_result = await bench_send(engine, phone_number, groups, sink)
+    finally:
+        sink.close()
+    return {"group_sync": sync_result, "send": send_result, "peak_rss_mb": peak_rss_mb()}
+
+def print_report(result):
+    sync_result, send_result = result["group_sync"], result["send"]
+    print(f"Group sync ({sync_result['groups']} groups)")
+    print(f"  full:        {sync_result['full_sync_seconds']:.3f}s, {sync_result['full_sync_api_calls']} API calls")
+    print(f"  incremental: {sync_result['incremental_sync_seconds']:.3f}s, {sync_result['incremental_sync_api_calls']} API calls")
+    print(f"Send loop ({send_result['targets']} targets)")
+    print(f"  sent {send_result['sent']} in {send_result['seconds']:.3f}s ({send_result['messages_per_second']} msg/s, {send_result['send_calls']} calls)")
+    print(f"  latency p50 {send_result['send_latency_p50_ms']:.3f} ms, p99 {send_result['send_latency_p99_ms']:.3f} ms")
+    print(f"  errors: {send_result['errors'] or 'none'}")
+    print("UI log path")
+    print(f"  {send_result['ui_events']} engine events, {send_result['ui_ticks']} drain ticks")
+    print(f"  {send_result['ui_textbox_inserts']} textbox inserts, {send_result['ui_label_updates']} label updates"
+          f" (unbatched: {send_result['ui_callbacks_unbatched']} Tk callbacks)")
+    rss = result["peak_rss_mb"]
+    print(f"Peak RSS: {rss:.1f} MB" if rss is not None else "Peak RSS: n/a")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_sender", description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=10000, help="Number of synthetic groups (default: 10000).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Base latency of every API call.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random latency, uniform in [0, jitter].")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of sends that fail with ChatWriteForbiddenError.")
+    parser.add_argument("--flood-rate", type=float, default=0.001, help="Share of sends that raise FloodWaitError.")
+    parser.add_argument("--flood-seconds", type=int, default=0, help="Seconds carried by injected FloodWaitErrors.")
+    parser.add_argument("--slow-mode-rate", type=float, default=0.0, help="Share of sends that raise SlowModeWaitError.")
+    parser.add_argument("--slow-mode-seconds", type=int, default=0, help="Seconds carried by injected SlowModeWaitErrors.")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="Pacing floor between sends in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    pacing.MIN_SEND_INTERVAL = args.min_interval
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="sender-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            result = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
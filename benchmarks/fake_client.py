@@ -0,0 +1,144 @@
+"""A local stand-in for TelegramClient with configurable latency and failures.
+
+Only the calls the engine uses are implemented. Entities are real Telethon types
+so the group index and peer records behave exactly as they do against Telegram.
+"""
+import asyncio
+import datetime
+import random
+import time
+
+from telethon import utils
+from telethon.errors import ChatWriteForbiddenError, FloodWaitError, SlowModeWaitError
+from telethon.tl.types import Channel, Chat, ChatPhotoEmpty
+
+class FakeDialog:
+    """The subset of telethon.tl.custom.Dialog read by get_groups_async."""
+    def __init__(self, entity, date, pinned=False):
+        self.entity = entity
+        self.title = entity.title
+        self.is_group = True
+        self.pinned = pinned
+        self.date = date
+
+class FakeDialogIterator:
+    """Async iterator with a `total` attribute, like client.iter_dialogs()."""
+    def __init__(self, client, dialogs):
+        self._client = client
+        self._dialogs = dialogs
+        self.total = len(dialogs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Telegram returns dialogs in pages of 100; pay one round trip per page.
+        for i, dialog in enumerate(self._dialogs):
+            if i % 100 == 0:
+                self._client.api_calls += 1
+                await self._client.simulate_latency()
+            yield dialog
+
+class FakeTelegramClient:
+    """Pretends to be a connected, authorized TelegramClient.
+
+    `latency` and `jitter` are in seconds. `error_rate`, `flood_rate` and
+    `slow_mode_rate` are per-send probabilities of ChatWriteForbiddenError,
+    FloodWaitError(flood_seconds) and SlowModeWaitError(slow_mode_seconds).
+    """
+    def __init__(self, groups=10000, latency=0.0, jitter=0.0, error_rate=0.0,
+                 flood_rate=0.0, flood_seconds=0, slow_mode_rate=0.0, slow_mode_seconds=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.slow_mode_rate = slow_mode_rate
+        self.slow_mode_seconds = slow_mode_seconds
+        self.flood_sleep_threshold = 60
+        self.random = random.Random(seed)
+        self.connected = True
+        self.api_calls = 0
+        self.send_latencies = []  # seconds per send_message call, successful or not
+        self.errors = {}
+        self.dialogs = self._make_dialogs(groups)
+        self.entities = {}  # marked id and username -> entity
+        for dialog in self.dialogs:
+            entity = dialog.entity
+            self.entities[utils.get_peer_id(entity)] = entity
+            self.entities[f"{'supergroup' if isinstance(entity, Channel) else 'group'}{entity.id}"] = entity
+
+    @staticmethod
+    def _make_dialogs(count):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        dialogs = []
+        for i in range(1, count + 1):
+            date = now - datetime.timedelta(minutes=i)
+            if i % 4 == 0:
+                entity = Chat(id=i, title=f"Basic group {i}", photo=ChatPhotoEmpty(),
+                              participants_count=50, date=date, version=1)
+            else:
+                entity = Channel(id=i, title=f"Supergroup {i}", photo=ChatPhotoEmpty(),
+                                 date=date, access_hash=i * 7919, megagroup=True)
+            dialogs.append(FakeDialog(entity, date))
+        return dialogs
+
+    async def simulate_latency(self):
+        delay = self.latency + (self.random.random() * self.jitter if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            # Still yield to the loop like a real network call would.
+            await asyncio.sleep(0)
+
+    # --- TelegramClient API used by the engine ---
+
+    def is_connected(self):
+        return self.connected
+
+    async def connect(self):
+        self.connected = True
+
+    async def start(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def is_user_authorized(self):
+        return True
+
+    def iter_dialogs(self):
+        return FakeDialogIterator(self, self.dialogs)
+
+    async def get_input_entity(self, peer):
+        """Resolves a marked id or a username like "supergroup12" to one of the fake groups."""
+        self.api_calls += 1
+        await self.simulate_latency()
+        entity = self.entities.get(peer)
+        if entity is None:
+            raise ValueError(f'Could not find the input entity for "{peer}"')
+        return utils.get_input_peer(entity)
+
+    async def send_message(self, entity, message, parse_mode=(), formatting_entities=None):
+        started = time.perf_counter()
+        self.api_calls += 1
+        try:
+            await self.simulate_latency()
+            roll = self.random.random()
+            if roll < self.flood_rate:
+                self._count("FloodWaitError")
+                raise FloodWaitError(request=None, capture=self.flood_seconds)
+            roll -= self.flood_rate
+            if roll < self.slow_mode_rate:
+                self._count("SlowModeWaitError")
+                raise SlowModeWaitError(request=None, capture=self.slow_mode_seconds)
+            roll -= self.slow_mode_rate
+            if roll < self.error_rate:
+                self._count("ChatWriteForbiddenError")
+                raise ChatWriteForbiddenError(request=None)
+        finally:
+            self.send_latencies.append(time.perf_counter() - started)
+
+    def _count(self, name):
+        self.errors[name] = self.errors.get(name, 0) + 1
@@ -1,170 +1,371 @@
+import time
+
+# Taken before any heavy import so --measure-startup covers the whole launch.
+STARTUP_STARTED = time.perf_counter()
+
 import customtkinter as ctk
-from telethon import TelegramClient
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 import os
-import json
 import sys
+import threading
+
+import telegram_sender as ts
+from telegram_sender import (
+    AccountStore,
+    AsyncLoopThread,
+    LOG_DRAIN_INTERVAL_MS,
+    LogSink,
+    Metrics,
+    MetricsServer,
+    GroupSearchIndex,
+    RunHistory,
+    TargetSets,
+    delete_account_files,
+)
 
 # --- Global Variables for Async Tasks ---
 # For communication between the UI and the Async Task
-client = None
-executor = ThreadPoolExecutor(max_workers=1)
-SESSION_FILE_PREFIX = 'group_sender_session_'
-ACCOUNTS_FILE = 'accounts.json'
+async_runner = AsyncLoopThread()
 
-# --- Asynchronous Telegram Functions ---
-# These functions can be outside the UI class.
+# The on-screen log keeps only the newest lines; the log file has the full history.
+LOG_MAX_LINES = 1000
+# How long deleting an account waits for its pooled client to disconnect.
+ACCOUNT_DISCONNECT_TIMEOUT = 10
 
-async def get_groups_async(app_instance):
-    """Fetches the list of all groups."""
-    global client
-    
-    # Check connection status without 'await' if it's not a coroutine
-    is_connected = False
-    try:
-        is_connected = await client.is_connected()
-    except TypeError:
-        is_connected = client.is_connected()
-
-    if not client or not is_connected:
-        await client.start()
-        
-    groups = []
-    async for d in client.iter_dialogs():
-        # Selects only groups or supergroups
-        if d.is_group and d.title is not None:
-            # For displaying the Title
-            groups.append((d.entity, d.title)) 
-    print(f"Groups found: {len(groups)}")
-    return groups
-
-async def send_message_to_groups(app_instance, message_text, delay_seconds, groups_list):
-    """Sends the message to groups according to the specified delay."""
-    global client
-    
-    is_connected = False
-    try:
-        is_connected = await client.is_connected()
-    except TypeError:
-        is_connected = client.is_connected()
-
-    if not is_connected:
-        await client.start()
-    
-    app_instance.stop_requested = False
-    
-    for entity, title in groups_list:
-        if app_instance.stop_requested:
-            app_instance.log_to_textbox("\n--- Process stopped by user! ---")
-            break
-            
-        try:
-            # Send the message
-            await client.send_message(entity, message_text)
-            
-            # Update the log and sent count
-            # Use app_instance.after() to safely update the UI from this thread
-            app_instance.after(0, lambda t=title: app_instance.log_to_textbox(f"✅ Sent to: {t}"))
-            app_instance.after(0, app_instance.increment_sent_count)
-            
-            # Add the specified delay
-            if delay_seconds > 0:
-                await asyncio.sleep(delay_seconds)
-            
-        except Exception as e:
-            app_instance.after(0, lambda t=title, err=e: app_instance.log_to_textbox(f"❌ Error sending to {t}: {err}"))
-            await asyncio.sleep(5) # Adds a small delay if there's an error
-    else: # This block runs if the for loop completes without a 'break'
-        app_instance.after(0, lambda: app_instance.log_to_textbox("\n--- All messages sent successfully! ---"))
-
-async def attempt_telethon_login(app_instance, api_id, api_hash, phone_number):
-    """Handles the async login process with Telethon."""
-    global client
-    try:
-        session_file = f"{SESSION_FILE_PREFIX}{phone_number}"
-        
-        # If a client already exists from a previous session, disconnect it first.
-        if client:
-            try:
-                if await client.is_connected():
-                    await client.disconnect()
-            except TypeError:
-                 if client.is_connected():
-                    await client.disconnect()
-            
-        client = TelegramClient(session_file, api_id, api_hash)
-        
-        # Check connection status without 'await' if it's not a coroutine
-        is_connected = False
-        try:
-            is_connected = await client.is_connected()
-        except TypeError:
-            is_connected = client.is_connected()
+# The group picker renders this many rows and reuses them while scrolling.
+PICKER_VISIBLE_ROWS = 14
+PICKER_SEARCH_DELAY_MS = 150
+PICKER_KINDS = {"All types": "all", "Supergroups": "supergroup", "Basic groups": "basic"}
+PICKER_ACTIVITY = {"Any activity": None, "Active in 7 days": 7, "Active in 30 days": 30, "Active in 90 days": 90}
 
-        if not is_connected:
-            await client.connect()
-        
-        is_user_authorized = False
-        try:
-            is_user_authorized = await client.is_user_authorized()
-        except TypeError:
-            is_user_authorized = client.is_user_authorized()
+# Message formats offered in the main window, mapped to template parse modes.
+PARSE_MODE_LABELS = {"Markdown": "markdown", "HTML": "html", "Plain text": "plain"}
+SCHEDULE_TIME_FORMAT = "%Y-%m-%d %H:%M"
+# Periods offered in the history window, in days (None for everything).
+HISTORY_PERIODS = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "All time": None}
+
+# --- Group Picker ---
+class VirtualGroupList(ctk.CTkFrame):
+    """Scrollable list of checkable groups backed by a fixed pool of row widgets.
+
+    Only PICKER_VISIBLE_ROWS checkboxes ever exist; scrolling just rebinds them to
+    other records, so thousands of groups cost no more widgets than a dozen.
+    """
+    def __init__(self, master, records, selected_ids, on_change):
+        super().__init__(master)
+        self.records = records
+        self.selected_ids = selected_ids
+        self.on_change = on_change
+        self.items = []  # record positions currently shown, after search and filters
+        self.offset = 0
+        self.grid_columnconfigure(0, weight=1)
+
+        self.rows = []
+        for i in range(PICKER_VISIBLE_ROWS):
+            var = ctk.IntVar(value=0)
+            row = ctk.CTkCheckBox(self, text="", variable=var, command=lambda i=i: self._toggle(i))
+            row.grid(row=i, column=0, padx=(10, 0), pady=1, sticky="w")
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                row.bind(sequence, self._on_mouse_wheel)
+            self.rows.append((row, var))
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind(sequence, self._on_mouse_wheel)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scroll)
+        self.scrollbar.grid(row=0, column=1, rowspan=PICKER_VISIBLE_ROWS, sticky="ns")
 
-        if is_user_authorized:
-            return "authorized"
+    def set_items(self, items):
+        self.items = items
+        self.offset = 0
+        self.render()
+
+    def render(self):
+        """Binds the row pool to the records at the current offset."""
+        for i, (row, var) in enumerate(self.rows):
+            position = self.offset + i
+            if position < len(self.items):
+                record = self.records[self.items[position]]
+                suffix = f"  ({record.members} members)" if record.members else ""
+                row.configure(text=f"{record.title}{suffix}")
+                var.set(1 if record.peer_id in self.selected_ids else 0)
+                row.grid()
+            else:
+                row.grid_remove()
+        if self.items:
+            first = self.offset / len(self.items)
+            last = min(self.offset + PICKER_VISIBLE_ROWS, len(self.items)) / len(self.items)
+            self.scrollbar.set(first, last)
         else:
-            return "phone_required"
-    except Exception as e:
-        return f"Error: {e}"
-
-async def send_phone_code(app_instance, phone_number):
-    """Sends the verification code to the given phone number."""
-    global client
-    try:
-        app_instance.sent_code_hash = (await client.send_code_request(phone_number)).phone_code_hash
-        return "code_sent"
-    except Exception as e:
-        return f"Error: {e}"
-
-async def verify_phone_code(app_instance, phone_number, phone_code):
-    """Verifies the phone code to complete login."""
-    global client
-    try:
-        await client.sign_in(phone=phone_number, code=phone_code, phone_code_hash=app_instance.sent_code_hash)
-        
-        is_user_authorized = False
+            self.scrollbar.set(0, 1)
+
+    def _scroll_to(self, offset):
+        max_offset = max(len(self.items) - PICKER_VISIBLE_ROWS, 0)
+        offset = min(max(int(offset), 0), max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def _on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self._scroll_to(float(value) * len(self.items))
+        elif unit == "pages":
+            self._scroll_to(self.offset + int(value) * PICKER_VISIBLE_ROWS)
+        else:
+            self._scroll_to(self.offset + int(value) * 3)
+
+    def _on_mouse_wheel(self, event):
+        if sys.platform.startswith("win"):
+            delta = -int(event.delta / 40)
+        elif sys.platform == "darwin":
+            delta = -event.delta
+        else:
+            delta = -1 if event.num == 4 else 1
+        self._on_scroll("scroll", delta, "units")
+
+    def _toggle(self, row_index):
+        position = self.offset + row_index
+        if position >= len(self.items):
+            return
+        peer_id = self.records[self.items[position]].peer_id
+        if self.rows[row_index][1].get():
+            self.selected_ids.add(peer_id)
+        else:
+            self.selected_ids.discard(peer_id)
+        self.on_change()
+
+class GroupPicker(ctk.CTkToplevel):
+    """Window for searching, filtering and selecting the groups a run is sent to."""
+    def __init__(self, master, records, selected_ids, target_sets, on_done):
+        super().__init__(master)
+        self.title("Choose Groups")
+        self.geometry("460x640")
+        self.grab_set()
+
+        self.search_index = GroupSearchIndex(records)
+        self.selected_ids = set(selected_ids)
+        self.target_sets = target_sets
+        self.on_done = on_done
+        self._search_job = None
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+
+        self.search_var = ctk.StringVar()
+        self.search_var.trace_add("write", lambda *_: self._schedule_search())
+        ctk.CTkEntry(self, textvariable=self.search_var, placeholder_text="Search groups...").grid(
+            row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
+
+        filter_frame = ctk.CTkFrame(self, fg_color="transparent")
+        filter_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        self.kind_menu = ctk.CTkOptionMenu(filter_frame, values=list(PICKER_KINDS), width=120, command=lambda _: self.refresh())
+        self.kind_menu.grid(row=0, column=0, padx=(0, 5))
+        self.activity_menu = ctk.CTkOptionMenu(filter_frame, values=list(PICKER_ACTIVITY), width=140, command=lambda _: self.refresh())
+        self.activity_menu.grid(row=0, column=1, padx=5)
+        self.min_members_var = ctk.StringVar()
+        self.min_members_var.trace_add("write", lambda *_: self._schedule_search())
+        ctk.CTkEntry(filter_frame, textvariable=self.min_members_var, placeholder_text="Min members", width=100).grid(row=0, column=2, padx=(5, 0))
+
+        self.group_list = VirtualGroupList(self, self.search_index.records, self.selected_ids, self._update_count)
+        self.group_list.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
+
+        select_frame = ctk.CTkFrame(self, fg_color="transparent")
+        select_frame.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+        select_frame.grid_columnconfigure(2, weight=1)
+        ctk.CTkButton(select_frame, text="Select shown", width=110, command=lambda: self._select_shown(True)).grid(row=0, column=0, padx=(0, 5))
+        ctk.CTkButton(select_frame, text="Clear shown", width=110, command=lambda: self._select_shown(False)).grid(row=0, column=1, padx=5)
+        self.count_label = ctk.CTkLabel(select_frame, text="")
+        self.count_label.grid(row=0, column=2, padx=(5, 0), sticky="e")
+
+        sets_frame = ctk.CTkFrame(self, fg_color="transparent")
+        sets_frame.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
+        sets_frame.grid_columnconfigure(0, weight=1)
+        self.sets_menu = ctk.CTkOptionMenu(sets_frame, values=self.target_sets.names() or ["No saved sets"])
+        self.sets_menu.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        ctk.CTkButton(sets_frame, text="Load", width=60, command=self._load_set).grid(row=0, column=1, padx=5)
+        ctk.CTkButton(sets_frame, text="Save as...", width=80, command=self._save_set).grid(row=0, column=2, padx=5)
+        ctk.CTkButton(sets_frame, text="Delete", width=60, fg_color="#d62828", command=self._delete_set).grid(row=0, column=3, padx=(5, 0))
+
+        ctk.CTkButton(self, text="Done", command=self._done).grid(row=5, column=0, padx=10, pady=(5, 10), sticky="ew")
+        self.refresh()
+
+    def _schedule_search(self):
+        # Debounce typing so a burst of keystrokes triggers a single search.
+        if self._search_job:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(PICKER_SEARCH_DELAY_MS, self.refresh)
+
+    def refresh(self):
+        self._search_job = None
         try:
-            is_user_authorized = await client.is_user_authorized()
-        except TypeError:
-            is_user_authorized = client.is_user_authorized()
+            min_members = int(self.min_members_var.get())
+        except ValueError:
+            min_members = None
+        items = self.search_index.search(
+            self.search_var.get(),
+            kind=PICKER_KINDS[self.kind_menu.get()],
+            min_members=min_members,
+            active_within_days=PICKER_ACTIVITY[self.activity_menu.get()],
+        )
+        self.group_list.set_items(items)
+        self._update_count()
 
-        if is_user_authorized:
-            return "authorized"
+    def _update_count(self):
+        self.count_label.configure(text=f"{len(self.selected_ids)} of {len(self.search_index.records)} selected"
+                                        f" ({len(self.group_list.items)} shown)")
+
+    def _select_shown(self, selected):
+        records = self.search_index.records
+        peer_ids = {records[i].peer_id for i in self.group_list.items}
+        if selected:
+            self.selected_ids |= peer_ids
         else:
-            return "Failed to sign in."
-    except Exception as e:
-        return f"Error: {e}"
-        
-# --- Data Management Functions ---
-def load_accounts():
-    """Loads accounts from the JSON file."""
-    if os.path.exists(ACCOUNTS_FILE):
-        with open(ACCOUNTS_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+            self.selected_ids -= peer_ids
+        self.group_list.render()
+        self._update_count()
+
+    def _load_set(self):
+        name = self.sets_menu.get()
+        if name not in self.target_sets.sets:
+            return
+        self.selected_ids.clear()
+        self.selected_ids |= self.target_sets.get(name)
+        self.group_list.render()
+        self._update_count()
+
+    def _save_set(self):
+        name = ctk.CTkInputDialog(text="Name for this set of groups:", title="Save Target Set").get_input()
+        if not name or not name.strip():
+            return
+        self.target_sets.put(name.strip(), self.selected_ids)
+        self.sets_menu.configure(values=self.target_sets.names())
+        self.sets_menu.set(name.strip())
+
+    def _delete_set(self):
+        name = self.sets_menu.get()
+        if name not in self.target_sets.sets:
+            return
+        self.target_sets.delete(name)
+        self.sets_menu.configure(values=self.target_sets.names() or ["No saved sets"])
+        self.sets_menu.set(self.target_sets.names()[0] if self.target_sets.sets else "No saved sets")
+
+    def _done(self):
+        self.on_done(self.selected_ids)
+        self.destroy()
+
+# --- Scheduled Jobs ---
+class ScheduleDialog(ctk.CTkToplevel):
+    """Window for scheduling the current message and removing scheduled jobs."""
+    def __init__(self, master, scheduler, on_schedule):
+        super().__init__(master)
+        self.title("Scheduled Jobs")
+        self.geometry("440x480")
+        self.grab_set()
+
+        self.scheduler = scheduler
+        self.on_schedule = on_schedule
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(3, weight=1)
 
-def save_accounts(accounts):
-    """Saves accounts to the JSON file."""
-    with open(ACCOUNTS_FILE, 'w') as f:
-        json.dump(accounts, f, indent=4)
+        form = ctk.CTkFrame(self, fg_color="transparent")
+        form.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
+        form.grid_columnconfigure(1, weight=1)
+        self.run_at_var = ctk.StringVar(value=time.strftime(SCHEDULE_TIME_FORMAT, time.localtime(time.time() + 3600)))
+        self.cron_var = ctk.StringVar()
+        ctk.CTkLabel(form, text="Run at:").grid(row=0, column=0, padx=(0, 5), pady=5, sticky="w")
+        ctk.CTkEntry(form, textvariable=self.run_at_var).grid(row=0, column=1, pady=5, sticky="ew")
+        ctk.CTkLabel(form, text="Repeat (cron, optional):").grid(row=1, column=0, padx=(0, 5), pady=5, sticky="w")
+        ctk.CTkEntry(form, textvariable=self.cron_var).grid(row=1, column=1, pady=5, sticky="ew")
+
+        ctk.CTkButton(self, text="⏰ Schedule Current Message", command=self._schedule).grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        self.status_label = ctk.CTkLabel(self, text="e.g. cron '0 9 * * 1-5' repeats at 09:00 on weekdays.")
+        self.status_label.grid(row=2, column=0, padx=10, pady=5)
+
+        self.entry_list = ctk.CTkScrollableFrame(self)
+        self.entry_list.grid(row=3, column=0, padx=10, pady=(5, 10), sticky="nsew")
+        self.refresh()
+
+    def refresh(self):
+        for widget in self.entry_list.winfo_children():
+            widget.destroy()
+        entries = sorted(self.scheduler.schedule.entries.values(), key=lambda e: e["next_run"])
+        if not entries:
+            ctk.CTkLabel(self.entry_list, text="Nothing scheduled.").pack(pady=20)
+            return
+        for entry in entries:
+            row = ctk.CTkFrame(self.entry_list, fg_color="transparent")
+            row.pack(fill="x", padx=5, pady=3)
+            row.grid_columnconfigure(0, weight=1)
+            repeat = f"cron {entry['cron']}" if entry["cron"] else "once"
+            targets = "all groups" if entry["targets"] is None else f"{len(entry['targets'])} groups"
+            next_run = time.strftime(SCHEDULE_TIME_FORMAT, time.localtime(entry["next_run"]))
+            ctk.CTkLabel(row, text=f"{next_run} · {repeat} · {targets}", anchor="w").grid(row=0, column=0, sticky="ew")
+            ctk.CTkButton(row, text="Remove", width=70, fg_color="#d62828",
+                          command=lambda i=entry["id"]: self._remove(i)).grid(row=0, column=1, padx=(5, 0))
+
+    def _schedule(self):
+        self.status_label.configure(text="Checking the message...", text_color="yellow")
+        self.on_schedule(self.run_at_var.get(), self.cron_var.get().strip() or None, self._scheduled)
+
+    def _scheduled(self, error):
+        if not self.winfo_exists():
+            return
+        if error:
+            self.status_label.configure(text=error, text_color="red")
+            return
+        self.status_label.configure(text="Scheduled.", text_color="green")
+        self.refresh()
+
+    def _remove(self, entry_id):
+        async_runner.submit(self.scheduler.remove(entry_id)).result(timeout=5)
+        self.refresh()
+
+class HistoryDialog(ctk.CTkToplevel):
+    """Window with the account's send statistics and a CSV export."""
+    def __init__(self, master, history, phone_number):
+        super().__init__(master)
+        self.title(f"Send History: {phone_number}")
+        self.geometry("520x480")
+
+        self.history = history
+        self.phone_number = phone_number
+        self.grid_columnconfigure((0, 1), weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.period_var = ctk.StringVar(value="Last 30 days")
+        ctk.CTkOptionMenu(self, values=list(HISTORY_PERIODS), variable=self.period_var,
+                          command=lambda _: self.refresh()).grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        ctk.CTkButton(self, text="💾 Export CSV", command=self._export).grid(row=0, column=1, padx=10, pady=10, sticky="e")
+        self.report = ctk.CTkTextbox(self, font=("Courier", 12), wrap="none")
+        self.report.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="nsew")
+        self.status_label = ctk.CTkLabel(self, text="")
+        self.status_label.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 10))
+        self.refresh()
+
+    def _since(self):
+        days = HISTORY_PERIODS[self.period_var.get()]
+        return time.time() - days * 86400 if days else 0
+
+    def refresh(self):
+        lines = ts.summary_text(self.history, self.phone_number, self._since())
+        self.report.configure(state="normal")
+        self.report.delete("1.0", "end")
+        self.report.insert("1.0", "\n".join(lines))
+        self.report.configure(state="disabled")
+
+    def _export(self):
+        path = ctk.filedialog.asksaveasfilename(title="Export Send History", defaultextension=".csv",
+                                                initialfile=f"history_{self.phone_number}.csv",
+                                                filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        try:
+            count = self.history.export_csv(path, self.phone_number, self._since())
+        except OSError as e:
+            self.status_label.configure(text=f"Export failed: {e}", text_color="red")
+            return
+        self.status_label.configure(text=f"Exported {count} send outcomes.", text_color="green")
 
 # --- CustomTkinter UI Class ---
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, measure_startup=False):
         super().__init__()
 
         # Window Settings
@@ -174,15 +375,56 @@ class App(ctk.CTk):
 
         # Variables
         self.groups_data = []
+        self.selected_ids = None  # None sends to every group
         self.delay_var = ctk.StringVar(value="60")
-        self.stop_requested = False
-        self.sent_code_hash = None
+        # Hours within which the same message isn't sent to a chat again; 0 turns the guard off.
+        self.dedup_var = ctk.StringVar(value=f"{ts.DEDUP_WINDOW / 3600:g}")
+        # The engine (and with it Telethon) is only built once an account is chosen.
+        self.engine = None
+        self.scheduler = None
+        self.metrics = Metrics()
+        self.metrics_server = MetricsServer.from_env(self.metrics)
         self.phone_number = None
-        self.accounts = load_accounts()
+        self.account_store = AccountStore()
+        self.history = RunHistory()
+        self.accounts = {}
         self.sent_count = 0
+        self.send_future = None
+        self.sending = False
+        self.attachments = []
+        self.variables_file = None
+        self.parse_mode_var = ctk.StringVar(value="Markdown")
+        self.log_sink = LogSink()
+        self.measure_startup = measure_startup
+        self.startup_times = {}
         
         # Initial UI setup
         self.show_account_selection_ui()
+        self.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
+        self.after_idle(self._on_first_paint)
+
+    def _on_first_paint(self):
+        """Imports the Telegram core in the background while the user picks an account."""
+        self.startup_times["window"] = time.perf_counter() - STARTUP_STARTED
+        threading.Thread(target=self._warm_up_core, name="warm-up", daemon=True).start()
+
+    def _warm_up_core(self):
+        ts.warm_up()
+        self.startup_times["core"] = time.perf_counter() - STARTUP_STARTED
+        if self.measure_startup:
+            self.after(0, self._report_startup)
+
+    def _report_startup(self):
+        print(f"Window shown after {self.startup_times['window'] * 1000:.0f} ms, "
+              f"core ready after {self.startup_times['core'] * 1000:.0f} ms.", flush=True)
+        self.destroy()
+
+    def _ensure_engine(self):
+        """Creates the engine the first time an account is used."""
+        if self.engine is None:
+            self.engine = ts.SenderEngine(on_event=self._on_engine_event, metrics=self.metrics,
+                                          accounts=self.account_store, history=self.history)
+        return self.engine
         
     def show_account_selection_ui(self):
         """Shows the UI for selecting or adding an account."""
@@ -209,7 +451,9 @@ class App(ctk.CTk):
         """Refreshes the list of accounts on the UI."""
         for widget in self.account_list_frame.winfo_children():
             widget.destroy()
-            
+
+        # Re-read the store so changes made by another running instance show up too.
+        self.accounts = self.account_store.all()
         if not self.accounts:
             ctk.CTkLabel(self.account_list_frame, text="No accounts saved yet.").pack(pady=20)
             return
@@ -219,7 +463,8 @@ class App(ctk.CTk):
             account_row_frame.pack(fill="x", padx=5, pady=5)
             account_row_frame.grid_columnconfigure(0, weight=1)
             
-            phone_button = ctk.CTkButton(account_row_frame, text=phone, 
+            label = phone if details["group_count"] is None else f"{phone}  ·  {details['group_count']} groups"
+            phone_button = ctk.CTkButton(account_row_frame, text=label, 
                                           command=lambda p=phone, d=details: self.attempt_login(p, d))
             phone_button.grid(row=0, column=0, sticky="ew", padx=(0, 5))
 
@@ -228,15 +473,17 @@ class App(ctk.CTk):
             delete_button.grid(row=0, column=1, padx=(5, 0))
     
     def delete_account(self, phone):
-        """Deletes an account from the dictionary and the JSON file."""
+        """Deletes an account, its session file and everything cached for it."""
         if phone in self.accounts:
-            del self.accounts[phone]
-            save_accounts(self.accounts)
-            
-            # Delete the session file as well
-            session_file = f"{SESSION_FILE_PREFIX}{phone}.session"
-            if os.path.exists(session_file):
-                os.remove(session_file)
+            try:
+                if self.engine:
+                    # The pooled client holds the session file open until it disconnects.
+                    async_runner.submit(self.engine.pool.discard(phone)).result(timeout=ACCOUNT_DISCONNECT_TIMEOUT)
+                delete_account_files(phone)
+            except Exception as e:
+                self.status_label.configure(text=f"Could not delete account {phone}: {e}")
+                return
+            self.account_store.delete(phone)
             
             self.status_label.configure(text=f"Account {phone} deleted.")
             self.update_account_list()
@@ -263,7 +510,7 @@ class App(ctk.CTk):
         self.add_status_label.pack(pady=5)
 
     def save_new_account(self):
-        """Saves a new account to the dictionary and the JSON file."""
+        """Saves a new account to the account store."""
         api_id_str = self.new_api_id_entry.get().strip()
         api_hash = self.new_api_hash_entry.get().strip()
         phone_number = self.new_phone_entry.get().strip()
@@ -278,29 +525,49 @@ class App(ctk.CTk):
             self.add_status_label.configure(text="Invalid API ID. Must be a number.", text_color="red")
             return
 
-        if phone_number in self.accounts:
+        if not self.account_store.add(phone_number, api_id, api_hash):
             self.add_status_label.configure(text="Account already exists.", text_color="red")
             return
 
-        self.accounts[phone_number] = {"api_id": api_id, "api_hash": api_hash}
-        save_accounts(self.accounts)
         self.add_status_label.configure(text="Account saved successfully!", text_color="green")
         self.add_account_window.destroy()
         self.update_account_list()
 
+    def _on_engine_event(self, kind, data):
+        """Forwards engine events to the log sink. Called from the async loop thread."""
+        if kind == "log":
+            self.log_sink.log(data["text"])
+        elif kind == "sent":
+            self.log_sink.count_sent()
+        elif kind == "run":
+            # Scheduled runs start without the Send button, so the controls follow the engine.
+            state = data["state"]
+            if state in ("paused", "resumed"):
+                self.after(0, self._set_paused_state, state == "paused")
+            else:
+                self.after(0, self._set_sending_state, state == "started")
+
     def log_to_textbox(self, text):
-        """Adds messages to the UI Log Textbox."""
-        if hasattr(self, 'log_textbox'):
+        """Queues a message for the UI Log Textbox. Safe to call from any thread."""
+        self.log_sink.log(text)
+
+    def _drain_log(self):
+        """Flushes queued log lines and sent counts to the UI in one batch."""
+        lines, sent = self.log_sink.drain()
+        if sent:
+            self.sent_count += sent
+            if hasattr(self, 'sent_count_label') and self.sent_count_label.winfo_exists():
+                self.sent_count_label.configure(text=f"Sent: {self.sent_count}")
+        if lines and hasattr(self, 'log_textbox') and self.log_textbox.winfo_exists():
             self.log_textbox.configure(state="normal")
-            self.log_textbox.insert("end", text + "\n")
+            self.log_textbox.insert("end", "\n".join(lines) + "\n")
+            # Keep the on-screen log a bounded ring buffer
+            line_count = int(self.log_textbox.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_MAX_LINES:
+                self.log_textbox.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
             self.log_textbox.see("end") # scrolls to show the latest message
             self.log_textbox.configure(state="disabled")
-
-    def increment_sent_count(self):
-        """Increments the sent message count and updates the UI label."""
-        self.sent_count += 1
-        if hasattr(self, 'sent_count_label'):
-            self.sent_count_label.configure(text=f"Sent: {self.sent_count}")
+        self.after(LOG_DRAIN_INTERVAL_MS, self._drain_log)
 
     def attempt_login(self, phone_number, details):
         """Initial attempt to connect using stored credentials."""
@@ -310,7 +577,7 @@ class App(ctk.CTk):
         
         self.status_label.configure(text=f"Connecting to {self.phone_number}...", text_color="yellow")
         
-        executor.submit(self._run_async, attempt_telethon_login(self, api_id, api_hash, self.phone_number)).add_done_callback(self._handle_login_result)
+        async_runner.submit(ts.attempt_telethon_login(self._ensure_engine(), api_id, api_hash, self.phone_number)).add_done_callback(self._handle_login_result)
     
     def _handle_login_result(self, future):
         """Handles the result of the initial login attempt."""
@@ -348,7 +615,7 @@ class App(ctk.CTk):
         # We need to send the code request again since the client was just created.
         self.code_button.configure(state="disabled", text="Sending Code...")
         self.login_status_label.configure(text="Sending code...", text_color="yellow")
-        executor.submit(self._run_async, send_phone_code(self, self.phone_number)).add_done_callback(self._handle_phone_code_result)
+        async_runner.submit(ts.send_phone_code(self.engine, self.phone_number)).add_done_callback(self._handle_phone_code_result)
 
     def _handle_phone_code_result(self, future):
         """Handles the result of the code sending attempt."""
@@ -369,7 +636,7 @@ class App(ctk.CTk):
         
         self.code_button.configure(state="disabled", text="Verifying...")
         self.login_status_label.configure(text="Verifying...", text_color="yellow")
-        executor.submit(self._run_async, verify_phone_code(self, self.phone_number, phone_code)).add_done_callback(self._handle_code_verification_result)
+        async_runner.submit(ts.verify_phone_code(self.engine, self.phone_number, phone_code)).add_done_callback(self._handle_code_verification_result)
         
     def _handle_code_verification_result(self, future):
         """Handles the result of the code verification."""
@@ -388,6 +655,9 @@ class App(ctk.CTk):
             widget.destroy()
         
         self.sent_count = 0  # Reset the count for the new session
+        self.attachments = []
+        self.variables_file = None
+        self.selected_ids = None
         
         self.main_ui_frame = ctk.CTkFrame(self)
         self.main_ui_frame.pack(fill="both", expand=True)
@@ -410,6 +680,12 @@ class App(ctk.CTk):
         # Sent messages count label
         self.sent_count_label = ctk.CTkLabel(self.info_frame, text=f"Sent: {self.sent_count}")
         self.sent_count_label.grid(row=0, column=1, padx=10, pady=10, sticky="e")
+        self.pick_button = ctk.CTkButton(self.info_frame, text="🎯 Choose Groups", command=self.show_group_picker, state="disabled")
+        self.pick_button.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="ew")
+        self.schedule_button = ctk.CTkButton(self.info_frame, text="⏰ Schedule", command=self.show_schedule_dialog)
+        self.schedule_button.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="ew")
+        self.history_button = ctk.CTkButton(self.info_frame, text="📊 History", command=self.show_history_dialog)
+        self.history_button.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
         
         self.delay_frame = ctk.CTkFrame(self.main_ui_frame)
         self.delay_frame.grid(row=3, column=0, padx=20, pady=(0, 10), sticky="ew")
@@ -419,6 +695,18 @@ class App(ctk.CTk):
         self.delay_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
         self.delay_entry = ctk.CTkEntry(self.delay_frame, textvariable=self.delay_var, width=100)
         self.delay_entry.grid(row=0, column=1, padx=10, pady=10, sticky="e")
+        self.attach_button = ctk.CTkButton(self.delay_frame, text="📎 Attach Files", command=self.choose_attachments, width=120)
+        self.attach_button.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.attachments_label = ctk.CTkLabel(self.delay_frame, text="No attachments")
+        self.attachments_label.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="e")
+        self.parse_mode_menu = ctk.CTkOptionMenu(self.delay_frame, values=list(PARSE_MODE_LABELS), variable=self.parse_mode_var, width=120)
+        self.parse_mode_menu.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.variables_button = ctk.CTkButton(self.delay_frame, text="🧩 Variables CSV", command=self.choose_variables_file, width=120)
+        self.variables_button.grid(row=2, column=1, padx=10, pady=(0, 10), sticky="e")
+        self.dedup_label = ctk.CTkLabel(self.delay_frame, text="Skip repeats within (hours, 0 = off):")
+        self.dedup_label.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.dedup_entry = ctk.CTkEntry(self.delay_frame, textvariable=self.dedup_var, width=100)
+        self.dedup_entry.grid(row=3, column=1, padx=10, pady=(0, 10), sticky="e")
         
         self.button_frame = ctk.CTkFrame(self.main_ui_frame)
         self.button_frame.grid(row=4, column=0, padx=20, pady=(10, 20), sticky="ew")
@@ -426,10 +714,16 @@ class App(ctk.CTk):
 
         self.send_button = ctk.CTkButton(self.button_frame, text="🚀 Start Sending", command=self.start_sending, state="disabled")
         self.send_button.grid(row=0, column=0, padx=5, pady=10, sticky="ew")
+        self.pause_button = ctk.CTkButton(self.button_frame, text="⏸ Pause", command=self.toggle_pause, state="disabled")
+        self.pause_button.grid(row=0, column=1, padx=5, pady=10, sticky="ew")
         self.stop_button = ctk.CTkButton(self.button_frame, text="🛑 Stop Sending", command=self.stop_sending, state="disabled", fg_color="#d62828")
-        self.stop_button.grid(row=0, column=1, padx=5, pady=10, sticky="ew")
+        self.stop_button.grid(row=0, column=2, padx=5, pady=10, sticky="ew")
+        self.resume_button = ctk.CTkButton(self.button_frame, text="⏯ Resume Job", command=self.resume_job, state="disabled")
+        self.resume_button.grid(row=1, column=0, padx=5, pady=(0, 10), sticky="ew")
+        self.switch_button = ctk.CTkButton(self.button_frame, text="Switch Account", command=self.switch_account, fg_color="#5e5e5e")
+        self.switch_button.grid(row=1, column=1, padx=5, pady=(0, 10), sticky="ew")
         self.logout_button = ctk.CTkButton(self.button_frame, text="Logout", command=self.logout_user, fg_color="#5e5e5e")
-        self.logout_button.grid(row=0, column=2, padx=5, pady=10, sticky="ew")
+        self.logout_button.grid(row=1, column=2, padx=5, pady=(0, 10), sticky="ew")
 
         self.log_label = ctk.CTkLabel(self.main_ui_frame, text="Activity Log:")
         self.log_label.grid(row=5, column=0, padx=20, pady=(0, 5), sticky="w")
@@ -437,33 +731,23 @@ class App(ctk.CTk):
         self.log_textbox.grid(row=6, column=0, padx=20, pady=(0, 20), sticky="nsew")
         self.log_textbox.configure(state="disabled")
 
+        self.update_resume_button()
         self.load_groups()
+        self._start_scheduler()
 
     def logout_user(self):
         """Disconnects the client and returns to the login screen."""
         self.log_to_textbox("Logging out...")
-        # Use the executor to run the async logout function
-        executor.submit(self._run_async, self._perform_logout_async()).add_done_callback(self._handle_logout_complete)
+        self._stop_scheduler()
+        # Run the async logout function on the background loop
+        async_runner.submit(ts.perform_logout(self.engine)).add_done_callback(self._handle_logout_complete)
 
-    async def _perform_logout_async(self):
-        """Async function to handle the Telethon logout."""
-        global client
-        try:
-            is_connected = False
-            try:
-                is_connected = await client.is_connected()
-            except TypeError:
-                is_connected = client.is_connected()
+    def switch_account(self):
+        """Returns to the account list, keeping this account's client connected in the pool."""
+        self._stop_scheduler()
+        async_runner.loop.call_soon_threadsafe(self.engine.pool.release)
+        self.show_account_selection_ui()
 
-            if client and is_connected:
-                await client.log_out()
-                return "success"
-            else:
-                return "not_connected"
-        except Exception as e:
-            # Fallback to manual removal if log_out fails
-            return f"Error: {e}"
-    
     def _handle_logout_complete(self, future):
         """Handles the result of the async logout operation."""
         try:
@@ -480,91 +764,300 @@ class App(ctk.CTk):
             self.after(0, self.show_account_selection_ui)
 
     def load_groups(self):
-        """Asynchronously loads Telegram Groups."""
-        self.groups_info.configure(text="Groups: Fetching...")
-        self.log_to_textbox("Connecting to Telegram and fetching groups...")
+        """Shows the cached groups instantly, then refreshes them asynchronously."""
+        self.group_index = ts.GroupIndex(self.phone_number).load()
+        if self.group_index.groups:
+            self.groups_data = self.group_index.targets()
+            self.groups_info.configure(text=f"Groups Found: {len(self.groups_data)} (syncing...)")
+            self.log_to_textbox(f"Loaded {len(self.groups_data)} cached groups. Syncing with Telegram...")
+            self.send_button.configure(state="normal")
+            self.pick_button.configure(state="normal")
+        else:
+            self.groups_info.configure(text="Groups: Fetching...")
+            self.log_to_textbox("Connecting to Telegram and fetching groups...")
         
-        executor.submit(self._run_async, get_groups_async(self)).add_done_callback(self._groups_loaded_callback)
+        async_runner.submit(ts.get_groups_async(self.engine, self.group_index)).add_done_callback(self._groups_loaded_callback)
 
     def _groups_loaded_callback(self, future):
         """Updates the UI after groups are loaded."""
         try:
             self.groups_data = future.result()
             count = len(self.groups_data)
-            self.groups_info.configure(text=f"Groups Found: {count}")
+            self.update_groups_info()
             self.log_to_textbox(f"Successfully loaded {count} groups.")
         except Exception as e:
-            self.groups_info.configure(text="Groups: Error!")
+            if self.groups_data:
+                self.groups_info.configure(text=f"Groups Found: {len(self.groups_data)} (cached)")
+            else:
+                self.groups_info.configure(text="Groups: Error!")
             self.log_to_textbox(f"Connection Error: {e}")
         finally:
-            self.send_button.configure(state="normal")
+            # A sync can now finish while a send is running; don't re-enable the button then.
+            if not self.sending:
+                self.send_button.configure(state="normal")
+            self.pick_button.configure(state="normal")
 
-    def start_sending(self):
-        """Executes when the Send Button is pressed."""
+    def update_groups_info(self):
+        """Shows how many groups were found and, if narrowed down, how many are selected."""
+        if self.selected_ids is None:
+            self.groups_info.configure(text=f"Groups Found: {len(self.groups_data)}")
+        else:
+            selected = len(self.selected_ids & self.group_index.groups.keys())
+            self.groups_info.configure(text=f"Groups: {selected} of {len(self.groups_data)} selected")
+
+    def show_group_picker(self):
+        """Opens the group picker over the current group index."""
+        records = list(self.group_index.groups.values())
+        selected_ids = self.selected_ids if self.selected_ids is not None else self.group_index.groups.keys()
+        GroupPicker(self, records, selected_ids, TargetSets(self.phone_number).load(), self._groups_picked)
+
+    def _groups_picked(self, selected_ids):
+        # Selecting everything is the same as not narrowing down, and keeps newly synced groups included.
+        self.selected_ids = None if selected_ids >= self.group_index.groups.keys() else set(selected_ids)
+        self.update_groups_info()
+
+    def selected_targets(self):
+        """Returns the group records the next run is sent to."""
+        if self.selected_ids is None:
+            return self.groups_data
+        return self.group_index.targets(self.selected_ids)
+
+    def _run_settings(self):
+        """Checks the main window's inputs. Returns (message, delay, targets, parse_mode) or raises ValueError.
+
+        The message itself is checked against every target by _check_message.
+        """
         message = self.msg_textbox.get("1.0", "end-1c").strip()
         try:
             delay = int(self.delay_var.get())
         except ValueError:
-            self.log_to_textbox("❌ Error: Invalid delay value. Please use a number.")
-            return
+            raise ValueError("Invalid delay value. Please use a number.") from None
+        try:
+            dedup_hours = float(self.dedup_var.get())
+        except ValueError:
+            dedup_hours = -1
+        if not 0 <= dedup_hours <= 24 * 365:
+            raise ValueError("Invalid repeat window. Please use a number of hours, or 0 to send repeats.")
+        # Applies to this run, and to scheduled runs from now on.
+        self.engine.dedup_window = int(dedup_hours * 3600)
 
         if not self.groups_data:
-            self.log_to_textbox("❌ Error: No groups loaded. Check connection.")
-            return
+            raise ValueError("No groups loaded. Check connection.")
+
+        targets = self.selected_targets()
+        if not targets:
+            raise ValueError("No groups selected.")
         
-        if not message:
-            self.log_to_textbox("❌ Error: Message cannot be empty.")
+        if not message and not self.attachments:
+            raise ValueError("Message cannot be empty.")
+
+        error = ts.check_attachments(self.attachments)
+        if error:
+            raise ValueError(error)
+        return message, delay, targets, PARSE_MODE_LABELS[self.parse_mode_var.get()]
+
+    def _check_message(self, message, parse_mode, targets, attachments, variables_file, on_checked):
+        """Renders the message for every target in a worker thread, so a bad template fails before
+        anything is sent without freezing the window. Calls on_checked(error or None) on the Tk thread."""
+        def check():
+            error = ts.check_template(message, parse_mode, variables_file, targets, attachments)
+            self.after(0, on_checked, error)
+        threading.Thread(target=check, name="template-check", daemon=True).start()
+
+    def start_sending(self):
+        """Executes when the Send Button is pressed."""
+        try:
+            message, delay, targets, parse_mode = self._run_settings()
+        except ValueError as e:
+            self.log_to_textbox(f"❌ Error: {e}")
             return
-            
+
+        attachments, variables_file = self.attachments, self.variables_file
+        self.send_button.configure(state="disabled", text="Checking...")
+
+        def checked(error):
+            if not self.send_button.winfo_exists():
+                return  # the main screen was left in the meantime
+            if error:
+                self.send_button.configure(state="normal", text="🚀 Start Sending")
+                self.log_to_textbox(f"❌ Error: {error}")
+                return
+            job = ts.SendJob.create(self.phone_number, message, delay, targets, attachments, parse_mode, variables_file)
+            self.log_to_textbox(f"\n--- Starting sending process (Delay: {delay}s) ---")
+            self._run_job(job)
+
+        self._check_message(message, parse_mode, targets, attachments, variables_file, checked)
+
+    def show_schedule_dialog(self):
+        ScheduleDialog(self, self.scheduler, self.schedule_current_message)
+
+    def show_history_dialog(self):
+        HistoryDialog(self, self.history, self.phone_number)
+
+    def schedule_current_message(self, run_at_text, cron, on_done):
+        """Schedules the message as currently set up in the main window. Calls on_done(error or None)."""
+        try:
+            message, delay, targets, parse_mode = self._run_settings()
+            run_at = ts.parse_run_time(run_at_text)
+        except ValueError as e:
+            on_done(str(e))
+            return
+        selected_ids, attachments, variables_file = self.selected_ids, self.attachments, self.variables_file
+        scheduler = self.scheduler
+
+        def checked(error):
+            if error:
+                on_done(error)
+                return
+            try:
+                entry = async_runner.submit(scheduler.add(
+                    message, delay, run_at, cron, selected_ids, attachments, parse_mode, variables_file)).result(timeout=5)
+            except ValueError as e:
+                on_done(str(e))
+                return
+            next_run = time.strftime(SCHEDULE_TIME_FORMAT, time.localtime(entry["next_run"]))
+            self.log_to_textbox(f"⏰ Scheduled job {entry['id']}, next run at {next_run}.")
+            on_done(None)
+
+        self._check_message(message, parse_mode, targets, attachments, variables_file, checked)
+
+    def _start_scheduler(self):
+        """Runs this account's scheduled jobs while its main screen is open."""
+        self.scheduler = ts.Scheduler(self.engine, self.phone_number)
+        async_runner.submit(self.scheduler.run())
+
+    def _stop_scheduler(self):
+        if self.scheduler:
+            async_runner.loop.call_soon_threadsafe(self.scheduler.stop)
+            self.scheduler = None
+
+    def choose_attachments(self):
+        """Lets the user pick files to send with the message. Cancelling clears the selection."""
+        paths = ctk.filedialog.askopenfilenames(title="Attach Files")
+        self.set_attachments(list(paths))
+
+    def set_attachments(self, paths):
+        self.attachments = paths
+        if not paths:
+            self.attachments_label.configure(text="No attachments")
+        elif len(paths) == 1:
+            self.attachments_label.configure(text=os.path.basename(paths[0]))
+        else:
+            self.attachments_label.configure(text=f"{len(paths)} files (album)")
+
+    def choose_variables_file(self):
+        """Lets the user pick a CSV of per-chat template variables. Cancelling clears it."""
+        path = ctk.filedialog.askopenfilename(title="Template Variables", filetypes=[("CSV files", "*.csv"), ("All files", "*")])
+        self.set_variables_file(path or None)
+
+    def set_variables_file(self, path):
+        self.variables_file = path
+        if path:
+            self.variables_button.configure(text=f"🧩 {os.path.basename(path)}")
+        else:
+            self.variables_button.configure(text="🧩 Variables CSV")
+
+    def resume_job(self):
+        """Continues the latest unfinished job from its last checkpoint."""
+        job = ts.SendJob.latest_unfinished(self.phone_number)
+        if not job:
+            self.log_to_textbox("No unfinished job to resume.")
+            self.resume_button.configure(state="disabled")
+            return
+
+        pending = len(job.pending_targets())
+        self.msg_textbox.delete("1.0", "end")
+        self.msg_textbox.insert("1.0", job.message)
+        self.set_attachments(job.attachments)
+        self.set_variables_file(job.variables_file)
+        self.parse_mode_var.set(next(label for label, mode in PARSE_MODE_LABELS.items() if mode == job.parse_mode))
+        self.log_to_textbox(f"\n--- Resuming job: {pending} of {len(job.targets)} groups left (Delay: {job.delay_seconds}s) ---")
+        self._run_job(job)
+
+    def _run_job(self, job):
+        """Disables the UI and starts the sending process for a job."""
         # Reset sent count when a new process starts
         self.sent_count = 0
         self.sent_count_label.configure(text=f"Sent: {self.sent_count}")
 
-        # Disables the UI and starts the Sending Process
-        self.send_button.configure(state="disabled", text="Sending...")
-        self.stop_button.configure(state="normal")
-        self.log_to_textbox(f"\n--- Starting sending process (Delay: {delay}s) ---")
+        self._set_sending_state(True)
         
         # Asynchronously run the send_message_to_groups function
-        executor.submit(
-            self._run_async, 
-            send_message_to_groups(self, message, delay, self.groups_data)
-        ).add_done_callback(self._sending_finished_callback)
+        self.send_future = async_runner.submit(ts.send_message_to_groups(self.engine, job))
+        self.send_future.add_done_callback(self._sending_finished_callback)
+
+    def update_resume_button(self):
+        """Enables the resume button if this account has an unfinished job."""
+        if ts.SendJob.latest_unfinished(self.phone_number):
+            self.resume_button.configure(state="normal")
+        else:
+            self.resume_button.configure(state="disabled")
 
     def stop_sending(self):
-        """Signals the ongoing process to stop."""
-        self.stop_requested = True
+        """Stops the ongoing process; the engine cuts any delay or upload short."""
+        async_runner.loop.call_soon_threadsafe(self.engine.request_stop)
         self.stop_button.configure(state="disabled", text="Stopping...")
+        self.pause_button.configure(state="disabled")
         self.send_button.configure(state="disabled")
 
+    def toggle_pause(self):
+        """Pauses or resumes the ongoing process; the button follows the engine's "run" events."""
+        if self.engine.paused:
+            async_runner.loop.call_soon_threadsafe(self.engine.resume)
+        else:
+            async_runner.loop.call_soon_threadsafe(self.engine.pause)
+        self.pause_button.configure(state="disabled")
+
+    def _set_paused_state(self, paused):
+        if not self.pause_button.winfo_exists() or not self.sending:
+            return
+        self.pause_button.configure(state="normal", text="▶ Continue" if paused else "⏸ Pause")
+
+    def _set_sending_state(self, sending):
+        """Switches the controls between idle and sending, for manual and scheduled runs alike."""
+        self.sending = sending
+        if not self.send_button.winfo_exists():
+            return  # the main screen was left in the meantime
+        if sending:
+            self.send_button.configure(state="disabled", text="Sending...")
+            self.resume_button.configure(state="disabled")
+            self.switch_button.configure(state="disabled")
+            self.logout_button.configure(state="disabled")
+            self.stop_button.configure(state="normal")
+            self.pause_button.configure(state="normal", text="⏸ Pause")
+        else:
+            self.send_button.configure(state="normal", text="🚀 Start Sending")
+            self.stop_button.configure(state="disabled", text="🛑 Stop Sending")
+            self.pause_button.configure(state="disabled", text="⏸ Pause")
+            self.switch_button.configure(state="normal")
+            self.logout_button.configure(state="normal")
+            self.update_resume_button()
+
     def _sending_finished_callback(self, future):
         """Resets the UI after the sending process is finished."""
-        self.send_button.configure(state="normal", text="🚀 Start Sending")
-        self.stop_button.configure(state="disabled", text="🛑 Stop Sending")
+        self._set_sending_state(False)
         
         # Check if an exception occurred during the process
-        if future.exception():
+        if future.cancelled():
+            self.log_to_textbox("\n--- Process cancelled. ---")
+        elif future.exception():
             self.log_to_textbox(f"❌ Critical Error during sending: {future.exception()}")
 
-    def _run_async(self, coro):
-        """Runs an Async function within an Event Loop."""
-        try:
-            # Attempts to get the Event Loop for the current Thread.
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            # If no Event Loop exists, creates a new one and sets it.
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-        # Runs the Coroutine in the Loop.
-        return loop.run_until_complete(coro)
-
 # --- Application Main Run ---
 if __name__ == "__main__":
     # Creates the App as a global variable.
-    app = App()
+    # --measure-startup prints how long the window and the Telegram core took to load, then exits.
+    app = App(measure_startup="--measure-startup" in sys.argv)
     app.mainloop() 
-    # Disconnects the Telegram Client when the Application closes.
-    if client:
-        executor.submit(client.disconnect)
-    executor.shutdown()
+    # Disconnects every pooled Telegram client when the Application closes.
+    if app.engine:
+        try:
+            async_runner.submit(ts.disconnect_client(app.engine)).result(timeout=10)
+        except Exception:
+            pass
+    async_runner.stop()
+    app.history.flush()
+    app.log_sink.close()
+    app.metrics.close()
+    if app.metrics_server:
+        app.metrics_server.stop()
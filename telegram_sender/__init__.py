@@ -0,0 +1,91 @@
+"""Headless core of Telegram Sender Pro.
+
+Nothing in this package imports a GUI toolkit; `bot.py` is a thin client on top of it
+and `python -m telegram_sender` drives it from the command line.
+
+Names are exported lazily: importing the package is cheap, and Telethon is only
+imported when something that needs it (the engine, groups, jobs, media) is first used.
+"""
+import importlib
+
+_EXPORTS = {
+    "ACCOUNTS_DB": ".accounts",
+    "AccountStore": ".accounts",
+    "SESSION_FILE_PREFIX": ".accounts",
+    "delete_account_files": ".accounts",
+    "session_path": ".accounts",
+    "ConnectionSupervisor": ".connection",
+    "DEDUP_WINDOW": ".dedup",
+    "SentIndex": ".dedup",
+    "SenderEngine": ".engine",
+    "attempt_telethon_login": ".engine",
+    "disconnect_client": ".engine",
+    "get_groups_async": ".engine",
+    "perform_logout": ".engine",
+    "send_message_to_groups": ".engine",
+    "send_phone_code": ".engine",
+    "verify_phone_code": ".engine",
+    "GroupIndex": ".groups",
+    "GroupRecord": ".groups",
+    "HISTORY_DB": ".history",
+    "RunHistory": ".history",
+    "summary_text": ".history",
+    "SendJob": ".jobs",
+    "StreamJob": ".jobs",
+    "LOG_DRAIN_INTERVAL_MS": ".logsink",
+    "LogSink": ".logsink",
+    "AsyncLoopThread": ".loop",
+    "MediaUploader": ".media",
+    "UploadCache": ".media",
+    "check_attachments": ".media",
+    "METRICS_PORT_ENV": ".metrics",
+    "Metrics": ".metrics",
+    "MetricsServer": ".metrics",
+    "SendPacer": ".pacing",
+    "ClientPool": ".pool",
+    "PreflightCache": ".preflight",
+    "preflight": ".preflight",
+    "CronSchedule": ".scheduler",
+    "Schedule": ".scheduler",
+    "Scheduler": ".scheduler",
+    "parse_run_time": ".scheduler",
+    "EntityResolver": ".streaming",
+    "TargetFile": ".streaming",
+    "send_to_target_file": ".streaming",
+    "GroupSearchIndex": ".selection",
+    "PARSE_MODES": ".templates",
+    "MessageTemplate": ".templates",
+    "check_template": ".templates",
+    "TargetSets": ".selection",
+    "normalize_title": ".selection",
+}
+
+# Modules that pull in Telethon; warm_up() imports them ahead of first use.
+TELETHON_MODULES = (".connection", ".engine", ".groups", ".jobs", ".media", ".pool", ".preflight", ".scheduler", ".streaming", ".templates")
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+def warm_up():
+    """Imports the Telethon-backed modules. Safe to call from a background thread."""
+    for module_name in TELETHON_MODULES:
+        importlib.import_module(module_name, __name__)
+
+def _frozen_imports():
+    """Never called. Lists every lazily loaded module as a plain import, so that
+    PyInstaller's static analysis bundles them, and Telethon with them, without
+    a spec file or hidden imports."""
+    from . import (  # noqa: F401
+        accounts, connection, dedup, engine, groups, history, jobs, jsonfile, logsink, loop, media,
+        metrics, pacing, pool, preflight, scheduler, selection, sqlitefile, streaming, templates,
+    )
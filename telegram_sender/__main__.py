@@ -0,0 +1,303 @@
+"""Command line entry point: python -m telegram_sender <command> ...
+
+Runs logins, group syncs and send jobs without starting Tk, so sends can run on a
+headless server. Accounts, sessions, group indexes and job journals are shared with the GUI.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from .accounts import AccountStore
+from .dedup import DEDUP_WINDOW
+from .engine import (
+    SenderEngine,
+    attempt_telethon_login,
+    disconnect_client,
+    get_groups_async,
+    send_message_to_groups,
+    send_phone_code,
+    verify_phone_code,
+)
+from .groups import GroupIndex
+from .history import RunHistory, summary_text
+from .jobs import SendJob, StreamJob
+from .media import check_attachments
+from .metrics import METRICS_PORT_ENV, MetricsServer
+from .scheduler import Schedule, Scheduler, parse_run_time
+from .selection import TargetSets
+from .streaming import send_to_target_file
+from .templates import PARSE_MODES, check_template
+
+def print_event(kind, data):
+    if kind == "log":
+        print(data["text"], flush=True)
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+def describe_account(phone_number, details):
+    """One line per account for the 'accounts' command."""
+    if details["last_sync"] is None:
+        return f"{phone_number}  (never synced)"
+    return f"{phone_number}  {details['group_count']} groups, last synced {format_time(details['last_sync'])}"
+
+def read_message(args):
+    """Returns the message of a send or schedule command, checked along with its attachments."""
+    if args.message_file:
+        with open(args.message_file, 'r', encoding='utf-8') as f:
+            message = f.read().strip()
+    else:
+        message = args.message.strip()
+    if not message and not args.attach:
+        raise SystemExit("Message cannot be empty.")
+    error = check_attachments(args.attach)
+    if error:
+        raise SystemExit(error)
+    return message
+
+async def login(engine, phone_number):
+    """Logs in with a saved account, prompting for the verification code if needed."""
+    details = engine.accounts.get(phone_number)
+    if not details:
+        raise SystemExit(f"Unknown account {phone_number}. Add it first with the 'add' command.")
+
+    result = await attempt_telethon_login(engine, details["api_id"], details["api_hash"], phone_number)
+    if result == "phone_required":
+        result = await send_phone_code(engine, phone_number)
+        if result != "code_sent":
+            raise SystemExit(result)
+        loop = asyncio.get_running_loop()
+        phone_code = await loop.run_in_executor(None, input, f"Code sent to {phone_number}: ")
+        result = await verify_phone_code(engine, phone_number, phone_code.strip())
+    if result != "authorized":
+        raise SystemExit(f"Login failed: {result}")
+    engine.log(f"Logged in as {phone_number}.")
+
+async def sync_groups(engine, phone_number, full=False, target_set=None):
+    group_index = GroupIndex(phone_number).load()
+    groups = await get_groups_async(engine, group_index, full=full)
+    engine.log(f"Successfully loaded {len(groups)} groups.")
+    if target_set:
+        target_sets = TargetSets(phone_number).load()
+        if target_set not in target_sets.sets:
+            raise SystemExit(f"Unknown target set '{target_set}'. Saved sets: {', '.join(target_sets.names()) or 'none'}.")
+        groups = group_index.targets(target_sets.get(target_set))
+        engine.log(f"Target set '{target_set}': {len(groups)} groups.")
+    return groups
+
+async def run_command(args):
+    engine = SenderEngine(on_event=print_event, dedup_window=int(args.dedup_window * 3600))
+    metrics_server = MetricsServer(engine.metrics, args.metrics_port).start() if args.metrics_port else None
+    try:
+        await login(engine, args.phone)
+        if args.command == "login":
+            return 0
+
+        if args.command == "groups":
+            groups = await sync_groups(engine, args.phone, full=args.full)
+            if args.list:
+                for record in groups:
+                    print(record.title)
+            return 0
+
+        if args.command == "schedule":  # run
+            scheduler = Scheduler(engine, args.phone)
+            next_run = scheduler.schedule.next_run()
+            engine.log(f"Scheduler running with {len(scheduler.schedule.entries)} job(s)"
+                       + (f", next at {format_time(next_run)}." if next_run else ".") + " Press Ctrl+C to stop.")
+            await scheduler.run()
+            return 0
+
+        if args.command == "send-file":
+            message = read_message(args)
+            if not os.path.isfile(args.file):
+                raise SystemExit(f"No target file {args.file}.")
+            error = check_template(message, args.parse_mode, args.variables, [], args.attach)
+            if error:
+                raise SystemExit(error)
+            job = StreamJob.create(args.phone, message, args.delay, args.file, args.attach, args.parse_mode, args.variables)
+            engine.log(f"\n--- Starting sending process from {args.file} (Delay: {args.delay}s) ---")
+            await send_to_target_file(engine, job)
+            return 0
+
+        if args.command == "send":
+            message = read_message(args)
+            groups = await sync_groups(engine, args.phone, target_set=args.target_set)
+            if not groups:
+                raise SystemExit("No groups loaded.")
+            error = check_template(message, args.parse_mode, args.variables, groups, args.attach)
+            if error:
+                raise SystemExit(error)
+            job = SendJob.create(args.phone, message, args.delay, groups, args.attach, args.parse_mode, args.variables)
+            engine.log(f"\n--- Starting sending process (Delay: {args.delay}s) ---")
+        else:  # resume
+            job = SendJob.latest_unfinished(args.phone)
+            if not job:
+                stream_job = StreamJob.latest_unfinished(args.phone)
+                if not stream_job:
+                    raise SystemExit("No unfinished job to resume.")
+                engine.log(f"\n--- Resuming job over {stream_job.target_file} (Delay: {stream_job.delay_seconds}s) ---")
+                await send_to_target_file(engine, stream_job)
+                return 0
+            engine.log(f"\n--- Resuming job: {len(job.pending_targets())} of {len(job.targets)} groups left (Delay: {job.delay_seconds}s) ---")
+
+        await send_message_to_groups(engine, job)
+        return 0
+    finally:
+        await disconnect_client(engine)
+        engine.history.flush()
+        engine.metrics.close()
+        if metrics_server:
+            metrics_server.stop()
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m telegram_sender", description="Telegram Sender Pro without the GUI.")
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get(METRICS_PORT_ENV) or 0),
+                        help=f"Serve Prometheus metrics on 127.0.0.1:PORT/metrics (default: ${METRICS_PORT_ENV}).")
+    parser.add_argument("--dedup-window", type=float, default=DEDUP_WINDOW / 3600, metavar="HOURS",
+                        help="Skip groups that got the same message within this many hours (default: %(default)g, 0 to resend).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("accounts", help="List saved accounts.")
+
+    add = commands.add_parser("add", help="Save a new account.")
+    add.add_argument("phone")
+    add.add_argument("--api-id", type=int, required=True)
+    add.add_argument("--api-hash", required=True)
+
+    login_cmd = commands.add_parser("login", help="Log in, asking for the verification code if needed.")
+    login_cmd.add_argument("phone")
+
+    groups = commands.add_parser("groups", help="Sync the account's groups.")
+    groups.add_argument("phone")
+    groups.add_argument("--full", action="store_true", help="Walk every dialog instead of only recent ones.")
+    groups.add_argument("--list", action="store_true", help="Print the group titles.")
+
+    send = commands.add_parser("send", help="Send a message to every group of the account.")
+    send.add_argument("phone")
+    add_message_arguments(send)
+
+    send_file = commands.add_parser("send-file", help="Send a message to every chat listed in a CSV or NDJSON file.")
+    send_file.add_argument("phone")
+    send_file.add_argument("file", help="Chat ids, @usernames or t.me links: a CSV with a peer_id, chat_id, chat, "
+                                        "username or id column (or just one per line), or NDJSON. Read as the run goes.")
+    add_message_arguments(send_file, target_set=False)
+
+    resume = commands.add_parser("resume", help="Continue the account's latest unfinished job.")
+    resume.add_argument("phone")
+
+    schedule = commands.add_parser("schedule", help="Manage and run scheduled send jobs.")
+    schedule_commands = schedule.add_subparsers(dest="schedule_command", required=True)
+    schedule_add = schedule_commands.add_parser("add", help="Schedule a message once or on a recurrence.")
+    schedule_add.add_argument("phone")
+    schedule_add.add_argument("--at", metavar="'YYYY-MM-DD HH:MM'", help="Run once at this local time, or start the recurrence from it.")
+    schedule_add.add_argument("--cron", metavar="EXPR",
+                              help="Repeat on a cron expression, e.g. '30 9 * * 1-5', or @hourly/@daily/@weekly/@monthly.")
+    add_message_arguments(schedule_add)
+    schedule_list = schedule_commands.add_parser("list", help="List the account's scheduled jobs.")
+    schedule_list.add_argument("phone")
+    schedule_remove = schedule_commands.add_parser("remove", help="Remove a scheduled job.")
+    schedule_remove.add_argument("phone")
+    schedule_remove.add_argument("id")
+    schedule_run = schedule_commands.add_parser("run", help="Log in and run the scheduled jobs until stopped.")
+    schedule_run.add_argument("phone")
+
+    history = commands.add_parser("history", help="Summarize the account's past sends, or export them.")
+    history.add_argument("phone")
+    history.add_argument("--days", type=float, default=30, help="Only look at the last DAYS days (default: 30, 0 for all).")
+    history.add_argument("--limit", type=int, default=10, help="Groups listed per report (default: 10).")
+    history.add_argument("--export", metavar="CSV", help="Write every send outcome to a CSV file instead.")
+    return parser
+
+def add_message_arguments(command, target_set=True):
+    """Options shared by 'send', 'send-file' and 'schedule add'."""
+    message = command.add_mutually_exclusive_group()
+    message.add_argument("--message", default="", help="Message text, or the caption when attaching files.")
+    message.add_argument("--message-file", help="Read the message from a UTF-8 text file.")
+    command.add_argument("--parse-mode", choices=list(PARSE_MODES), default="markdown",
+                         help="How the message is formatted (default: markdown).")
+    command.add_argument("--variables", metavar="CSV",
+                         help="Per-chat template variables; rows are matched by a peer_id or title column. "
+                              "Built in: {{title}}, {{members}}, {{greeting}}, {{date}}.")
+    if target_set:
+        command.add_argument("--target-set", metavar="NAME", help="Only send to a target set saved in the group picker.")
+    command.add_argument("--attach", action="append", default=[], metavar="PATH",
+                         help="Attach a file; repeat for an album of up to 10 files. Each file is uploaded once per run.")
+    command.add_argument("--delay", type=int, default=60, help="Delay between messages in seconds (default: 60).")
+
+def schedule_command(args):
+    """Handles the schedule subcommands that don't need a connection."""
+    schedule = Schedule(args.phone).load()
+    if args.schedule_command == "list":
+        for entry in sorted(schedule.entries.values(), key=lambda e: e["next_run"]):
+            repeat = f"cron '{entry['cron']}'" if entry["cron"] else "once"
+            targets = "all groups" if entry["targets"] is None else f"{len(entry['targets'])} groups"
+            print(f"{entry['id']}  next {format_time(entry['next_run'])}  {repeat}, {targets}: {entry['message'][:40]!r}")
+        return 0
+
+    if args.schedule_command == "remove":
+        if not schedule.remove(args.id):
+            raise SystemExit(f"No scheduled job '{args.id}'.")
+        print("Scheduled job removed.")
+        return 0
+
+    # add
+    message = read_message(args)
+    error = check_template(message, args.parse_mode, args.variables, [], args.attach)
+    if error:
+        raise SystemExit(error)
+    targets = None
+    if args.target_set:
+        target_sets = TargetSets(args.phone).load()
+        if args.target_set not in target_sets.sets:
+            raise SystemExit(f"Unknown target set '{args.target_set}'. Saved sets: {', '.join(target_sets.names()) or 'none'}.")
+        targets = target_sets.get(args.target_set)
+    try:
+        run_at = parse_run_time(args.at) if args.at else None
+        entry = schedule.add(message, args.delay, run_at, args.cron, targets, args.attach, args.parse_mode, args.variables)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"Scheduled job {entry['id']}, next run at {format_time(entry['next_run'])}.")
+    return 0
+
+def history_command(args):
+    history = RunHistory()
+    since = time.time() - args.days * 86400 if args.days else 0
+    if args.export:
+        count = history.export_csv(args.export, args.phone, since)
+        print(f"Exported {count} send outcomes to {args.export}.")
+        return 0
+    print("\n".join(summary_text(history, args.phone, since, args.limit)))
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "accounts":
+        for phone, details in AccountStore().all().items():
+            print(describe_account(phone, details))
+        return 0
+
+    if args.command == "add":
+        if not AccountStore().add(args.phone, args.api_id, args.api_hash):
+            raise SystemExit("Account already exists.")
+        print("Account saved successfully!")
+        return 0
+
+    if args.command == "history":
+        return history_command(args)
+
+    if args.command == "schedule" and args.schedule_command != "run":
+        return schedule_command(args)
+
+    try:
+        return asyncio.run(run_command(args))
+    except KeyboardInterrupt:
+        # The job journal was closed on the way out; `resume` picks up from here.
+        print("\n--- Process stopped by user! ---")
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
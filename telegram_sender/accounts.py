@@ -0,0 +1,103 @@
+"""Saved accounts and the file names derived from them."""
+import glob
+import json
+import os
+import time
+
+from .sqlitefile import SQLiteStore
+
+SESSION_FILE_PREFIX = 'group_sender_session_'
+ACCOUNTS_DB = 'accounts.db'
+# Older versions kept accounts in this file; it is imported into the database once.
+LEGACY_ACCOUNTS_FILE = 'accounts.json'
+ACCOUNT_METADATA = ("last_login", "last_sync", "group_count")
+
+def session_path(phone_number):
+    """Returns the Telethon session name for an account (without the .session suffix)."""
+    return f"{SESSION_FILE_PREFIX}{phone_number}"
+
+def delete_account_files(phone_number):
+    """Removes an account's session file and every per-account file kept next to it.
+
+    The account's client must be disconnected first: Telethon keeps the
+    session database open, and Windows won't remove an open file.
+    """
+    for path in glob.glob(f"{glob.escape(session_path(phone_number))}.*"):
+        os.remove(path)
+
+class AccountStore(SQLiteStore):
+    """Accounts and their metadata in an SQLite database.
+
+    Writes are transactional, so a crash can't leave a half-written account
+    list behind, and other app instances see them at once.
+    """
+    SCHEMA = """CREATE TABLE IF NOT EXISTS accounts (
+                    phone TEXT PRIMARY KEY,
+                    api_id INTEGER NOT NULL,
+                    api_hash TEXT NOT NULL,
+                    added REAL,
+                    last_login REAL,
+                    last_sync REAL,
+                    group_count INTEGER);"""
+
+    def __init__(self, path=ACCOUNTS_DB):
+        super().__init__(path)
+
+    def all(self):
+        """Returns {phone: {"api_id", "api_hash", "last_login", "last_sync", "group_count"}}, ordered by phone."""
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM accounts ORDER BY phone").fetchall()
+        return {row["phone"]: self._details(row) for row in rows}
+
+    def get(self, phone_number):
+        """Returns the account's details, or None if it isn't saved."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM accounts WHERE phone = ?", (phone_number,)).fetchone()
+        return self._details(row) if row else None
+
+    def add(self, phone_number, api_id, api_hash):
+        """Saves a new account. Returns False if the phone number is already saved."""
+        with self._connect() as db:
+            cursor = db.execute("INSERT OR IGNORE INTO accounts (phone, api_id, api_hash, added) VALUES (?, ?, ?, ?)",
+                                (phone_number, api_id, api_hash, time.time()))
+        return cursor.rowcount == 1
+
+    def delete(self, phone_number):
+        with self._connect() as db:
+            db.execute("DELETE FROM accounts WHERE phone = ?", (phone_number,))
+
+    def update(self, phone_number, **metadata):
+        """Updates metadata fields (see ACCOUNT_METADATA) of a saved account."""
+        unknown = set(metadata) - set(ACCOUNT_METADATA)
+        if unknown:
+            raise ValueError(f"Unknown account fields: {', '.join(sorted(unknown))}")
+        if not metadata:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in metadata)
+        with self._connect() as db:
+            db.execute(f"UPDATE accounts SET {assignments} WHERE phone = ?", (*metadata.values(), phone_number))
+
+    def _setup(self, db):
+        super()._setup(db)
+        self._import_legacy_file(db)
+
+    def _import_legacy_file(self, db):
+        """Moves accounts from the old accounts.json into the database, once."""
+        if not os.path.exists(LEGACY_ACCOUNTS_FILE):
+            return
+        try:
+            with open(LEGACY_ACCOUNTS_FILE, 'r') as f:
+                accounts = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return  # leave a damaged file where it is rather than lose it
+        with db:
+            db.executemany("INSERT OR IGNORE INTO accounts (phone, api_id, api_hash, added) VALUES (?, ?, ?, ?)",
+                           [(phone, d["api_id"], d["api_hash"], time.time()) for phone, d in accounts.items()])
+        try:
+            os.replace(LEGACY_ACCOUNTS_FILE, LEGACY_ACCOUNTS_FILE + '.imported')
+        except FileNotFoundError:
+            pass  # another instance imported it at the same time
+
+    @staticmethod
+    def _details(row):
+        return {name: row[name] for name in ("api_id", "api_hash") + ACCOUNT_METADATA}
@@ -0,0 +1,140 @@
+"""Connection health for long runs: a keepalive ping and reconnects with exponential backoff."""
+import asyncio
+import inspect
+import random
+import time
+
+from telethon import functions
+
+# While a run is going, the connection is pinged this often and given this long to answer.
+KEEPALIVE_INTERVAL = 60
+KEEPALIVE_TIMEOUT = 10
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+RECONNECT_MAX_ATTEMPTS = 10
+# A connection that drops again within this many seconds of a reconnect keeps backing off.
+RECONNECT_STABLE_AFTER = 60
+# Errors that mean the connection failed rather than the request; the request is retried after a reconnect.
+CONNECTION_ERRORS = (ConnectionError, asyncio.TimeoutError)
+
+async def maybe_await(value):
+    """Returns `value`, awaiting it first if it is awaitable.
+
+    Some client methods (is_connected) are plain functions in Telethon but may
+    be coroutines in stand-ins, and the reverse for is_user_authorized.
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+async def is_client_connected(client):
+    """Checks the connection status whether or not is_connected() is a coroutine."""
+    return client is not None and bool(await maybe_await(client.is_connected()))
+
+class ConnectionSupervisor:
+    """Keeps the engine's current client connected.
+
+    The send loops call ensure_connected() before every message and
+    reconnect() when a request fails with one of CONNECTION_ERRORS, then retry
+    the same target. A reconnect holds a lock, so every other sender waits
+    for it: the queue pauses instead of failing target after target. While a
+    run is going, a keepalive task pings the server and reconnects proactively
+    when the ping goes unanswered.
+
+    `generation` goes up with every reconnect. A caller passes the value it saw
+    before its request failed, so a failure that an earlier reconnect already
+    fixed doesn't cause a second one.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.generation = 0
+        self.reconnects = 0
+        self._lock = asyncio.Lock()
+        self._keepalive = None
+        self._delay = RECONNECT_BASE_DELAY
+        self._connected_at = 0.0
+
+    async def ensure_connected(self):
+        """Connects the client if it isn't. Returns False if the run was stopped first."""
+        if await is_client_connected(self.engine.client):
+            return True
+        return await self.reconnect(self.generation)
+
+    async def reconnect(self, generation, force=False):
+        """Reconnects with exponential backoff between attempts.
+
+        `force` drops a connection that still looks open, e.g. after a ping
+        timed out. Returns True once connected and False if the run was
+        stopped meanwhile. Raises ConnectionError after RECONNECT_MAX_ATTEMPTS.
+        """
+        engine = self.engine
+        async with self._lock:
+            if generation != self.generation:
+                return True  # reconnected while this caller waited for the lock
+            client = engine.client
+            started = time.monotonic()
+            if started - self._connected_at > RECONNECT_STABLE_AFTER:
+                self._delay = RECONNECT_BASE_DELAY
+            elif not await self._back_off():
+                return False
+            engine.log("🔌 Connection lost, reconnecting...")
+            engine.emit("connection", state="reconnecting")
+            error = None
+            for attempt in range(1, RECONNECT_MAX_ATTEMPTS + 1):
+                try:
+                    if force or attempt > 1:
+                        await maybe_await(client.disconnect())
+                    await client.connect()
+                    if await is_client_connected(client):
+                        break
+                except Exception as e:
+                    error = e
+                if attempt == RECONNECT_MAX_ATTEMPTS:
+                    engine.emit("connection", state="lost")
+                    raise ConnectionError(f"Could not reconnect after {attempt} attempts: {error}")
+                engine.log(f"🔌 Reconnect attempt {attempt} failed ({error or 'not connected'}), retrying in {self._delay:.1f}s.")
+                if not await self._back_off():
+                    return False
+
+            self.generation += 1
+            self.reconnects += 1
+            self._connected_at = time.monotonic()
+            seconds = self._connected_at - started
+            engine.metrics.record("reconnect", seconds=round(seconds, 3), attempts=attempt)
+            engine.log(f"🔌 Reconnected after {seconds:.1f}s.")
+            engine.emit("connection", state="connected")
+            return True
+
+    async def _back_off(self):
+        """Waits the current delay and doubles it, with jitter. Returns False if the run was stopped."""
+        delay = self._delay * random.uniform(0.8, 1.2)
+        self._delay = min(self._delay * 2, RECONNECT_MAX_DELAY)
+        if self.engine.job_path is None:
+            await asyncio.sleep(delay)
+            return True
+        return await self.engine.wait_to_send(delay)
+
+    def start_keepalive(self):
+        if self._keepalive is None or self._keepalive.done():
+            self._keepalive = asyncio.get_running_loop().create_task(self._keepalive_forever())
+
+    def stop_keepalive(self):
+        if self._keepalive:
+            self._keepalive.cancel()
+            self._keepalive = None
+
+    async def _keepalive_forever(self):
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            if self._lock.locked():
+                continue
+            generation = self.generation
+            try:
+                ping = functions.PingRequest(ping_id=random.getrandbits(63))
+                await asyncio.wait_for(self.engine.client(ping), KEEPALIVE_TIMEOUT)
+            except Exception as e:
+                self.engine.log(f"🔌 Keepalive ping failed: {str(e) or type(e).__name__}")
+                try:
+                    await self.reconnect(generation, force=True)
+                except ConnectionError as e:
+                    self.engine.log(f"❌ {e}")
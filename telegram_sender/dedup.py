@@ -0,0 +1,88 @@
+"""Duplicate-send guard: remembers which chats already received which message."""
+import hashlib
+import os
+import time
+
+from .accounts import session_path
+
+SENT_INDEX_SUFFIX = '.sent.log'
+# A message is not sent to the same chat again within this many seconds (0 turns the guard off).
+DEDUP_WINDOW = 24 * 60 * 60
+# The index file is rewritten without expired lines once they outnumber the live ones by this much.
+SENT_INDEX_COMPACT_RATIO = 2
+SENT_INDEX_COMPACT_MIN_LINES = 1000
+
+def content_key(text, parse_mode, attachment_digests=()):
+    """Short hash of everything that makes up a message as the chat sees it."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{parse_mode}\0{text}".encode("utf-8"))
+    for attachment_digest in attachment_digests:
+        digest.update(b"\0" + attachment_digest.encode("ascii"))
+    return digest.hexdigest()
+
+class SentIndex:
+    """Per-account record of (chat, message) pairs sent within the window.
+
+    The file next to the session is an append-only log of "<peer id> <content key>
+    <unix time>" lines; in memory it is a dict, so a lookup costs O(1) and no
+    API call. Expired lines are dropped when the file is compacted on load.
+    """
+    def __init__(self, phone_number, window=DEDUP_WINDOW):
+        self.path = f"{session_path(phone_number)}{SENT_INDEX_SUFFIX}"
+        self.window = window
+        self.sent = {}  # (peer id, content key) -> unix time of the last send
+        self._file = None
+        self._cut_line = False  # the file ends in a line cut short by a crash
+
+    def load(self):
+        """Reads the live entries; a line cut short by a crash is ignored."""
+        if not os.path.exists(self.path):
+            return self
+        cutoff = time.time() - self.window
+        lines = 0
+        with open(self.path, 'r', encoding='ascii', errors='replace') as f:
+            for line in f:
+                lines += 1
+                self._cut_line = not line.endswith("\n")
+                try:
+                    peer_id, key, sent_at = line.split()
+                    peer_id, sent_at = int(peer_id), int(sent_at)
+                except ValueError:
+                    continue
+                if sent_at >= cutoff:
+                    self.sent[(peer_id, key)] = sent_at
+        if lines >= SENT_INDEX_COMPACT_MIN_LINES and lines > SENT_INDEX_COMPACT_RATIO * len(self.sent):
+            self._compact()
+        return self
+
+    def seen(self, peer_id, key):
+        """True if this message went to this chat within the window."""
+        sent_at = self.sent.get((peer_id, key))
+        return sent_at is not None and sent_at >= time.time() - self.window
+
+    def record(self, peer_id, key):
+        sent_at = int(time.time())
+        self.sent[(peer_id, key)] = sent_at
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='ascii')
+            if self._cut_line:
+                self._file.write("\n")  # or this record would join the cut line
+                self._cut_line = False
+        self._file.write(f"{peer_id} {key} {sent_at}\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _compact(self):
+        """Rewrites the file with only the live entries, via a temporary file."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='ascii') as f:
+            for (peer_id, key), sent_at in self.sent.items():
+                f.write(f"{peer_id} {key} {sent_at}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._cut_line = False
@@ -0,0 +1,466 @@
+"""UI-independent Telegram logic: login, group sync and send jobs.
+
+The coroutines here take a SenderEngine instead of a window. The engine holds the
+client and run state, and reports progress through an event callback, so the same
+code drives both the GUI and the command line.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from telethon.errors import FloodWaitError, SlowModeWaitError
+
+from .accounts import AccountStore
+from .connection import CONNECTION_ERRORS, ConnectionSupervisor, is_client_connected, maybe_await
+from .dedup import DEDUP_WINDOW, SentIndex, content_key
+from .groups import GroupIndex
+from .history import RunHistory
+from .media import MediaUploader, file_digest
+from .metrics import Metrics
+from .pacing import SendPacer
+from .pool import ClientPool
+from .preflight import PreflightCache, blocked_kind, preflight
+from .templates import MessageTemplate, check_template
+
+class SenderEngine:
+    """Holds the Telegram client and run state for one account.
+
+    `on_event(kind, data)` is called for every event:
+    "log" with {"text"} for human readable progress lines,
+    "sent" with {"title"} whenever a message was delivered, and
+    "run" with {"state": "started" | "paused" | "resumed" | "finished", "job"}
+    around every send run, manual or scheduled,
+    "progress" with {"offset", "size"} in bytes during a run over a target file, and
+    "connection" with {"state": "reconnecting" | "connected" | "lost"} when the
+    client lost its connection and `connection` is getting it back.
+    It is called from whichever thread runs the coroutines.
+    Timings and error counts go to `metrics`. Clients of earlier accounts stay
+    connected in `pool`, so switching back to one skips the handshake. Login and
+    sync times are recorded on the account in `accounts`. A message is not sent to
+    the same chat twice within `dedup_window` seconds (0 turns that off). Every
+    send outcome is stored in `history`.
+
+    request_stop(), pause() and resume() must be called on the loop running the
+    send (e.g. through call_soon_threadsafe); they take effect at once, even in
+    the middle of a long delay.
+    """
+    def __init__(self, on_event=None, metrics=None, pool=None, accounts=None, dedup_window=DEDUP_WINDOW, history=None):
+        self.client = None
+        self.phone_number = None
+        self.sent_code_hash = None
+        self.stop_requested = False
+        self.paused = False
+        self.job_path = None  # journal of the run in progress
+        # Set whenever stop, pause or resume is requested, to cut a wait short.
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        # One send run at a time: a scheduled run waits for a manual one to finish.
+        self.send_lock = asyncio.Lock()
+        self.on_event = on_event
+        self.metrics = metrics or Metrics()
+        self.pool = pool or ClientPool()
+        self.accounts = accounts or AccountStore()
+        self.dedup_window = dedup_window
+        self.history = history or RunHistory()
+        self.connection = ConnectionSupervisor(self)
+
+    def emit(self, kind, **data):
+        if self.on_event:
+            self.on_event(kind, data)
+
+    def log(self, text):
+        self.emit("log", text=text)
+
+    def request_stop(self):
+        """Stops a running send: no further message goes out, and any wait or upload is cut short."""
+        self.stop_requested = True
+        self._stop.set()
+        self._wake.set()
+
+    def pause(self):
+        """Holds a running send before its next message; resume() carries on with the same queue."""
+        if self.job_path and not self.paused:
+            self.paused = True
+            self._wake.set()
+            self.emit("run", state="paused", job=self.job_path)
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self._wake.set()
+            self.emit("run", state="resumed", job=self.job_path)
+
+    @asynccontextmanager
+    async def running(self, job, on_start=None):
+        """Holds the send lock for one run, with fresh stop and pause state and the "run" events around it.
+
+        `on_start` is called as soon as the lock is held, before the run's state is reset.
+        """
+        async with self.send_lock:
+            if on_start:
+                on_start()
+            self.stop_requested = self.paused = False
+            self._stop.clear()
+            self.job_path = job.path
+            self.emit("run", state="started", job=job.path)
+            self.connection.start_keepalive()
+            try:
+                yield
+            finally:
+                self.connection.stop_keepalive()
+                self.job_path = None
+                self.paused = False
+                self.emit("run", state="finished", job=job.path)
+
+    async def wait_to_send(self, seconds):
+        """Waits `seconds`, and for as long as the run is paused. Returns False as soon as a stop is requested.
+
+        The wait ends at a fixed time, so time spent paused counts towards the delay.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + seconds
+        while not self.stop_requested:
+            timeout = None if self.paused else deadline - loop.time()
+            if timeout is not None and timeout <= 0:
+                return True
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return False
+
+    async def unless_stopped(self, coro):
+        """Runs `coro` as a task that is cancelled if a stop is requested first. Returns False if it was."""
+        task = asyncio.ensure_future(coro)
+        stop = asyncio.ensure_future(self._stop.wait())
+        try:
+            await asyncio.wait((task, stop), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.wait((task,))  # let it clean up before the caller goes on
+        if task.cancelled():
+            return False
+        task.result()  # re-raises the coroutine's exception
+        return True
+
+# --- Asynchronous Telegram Functions ---
+
+async def get_groups_async(engine, group_index, full=False):
+    """Refreshes the group index and returns the list of all groups.
+
+    Only dialogs with activity since the last sync are walked, unless a full
+    sync is requested or due, in which case groups that were left are evicted.
+    """
+    client = engine.client
+    started = time.perf_counter()
+    await engine.connection.ensure_connected()
+
+    full = full or group_index.needs_full_sync()
+    seen = {}
+    evicted = set()
+    newest_date = group_index.last_dialog_date
+    dialogs = client.iter_dialogs()
+    async for d in dialogs:
+        dialog_date = d.date.timestamp() if d.date else 0
+        # Dialogs come newest first; pinned ones are listed ahead regardless of date.
+        if not full and not d.pinned and dialog_date <= group_index.last_dialog_date:
+            break
+        newest_date = max(newest_date, dialog_date)
+        # Selects only groups or supergroups
+        if d.is_group and d.title is not None:
+            record = GroupIndex.record_from_dialog(d)
+            if getattr(d.entity, 'left', False) or getattr(d.entity, 'deactivated', False):
+                evicted.add(record.peer_id)
+            else:
+                seen[record.peer_id] = record
+
+    # Fewer dialogs than last time means something was left or deleted; only a full walk can tell what.
+    if not full and group_index.dialog_total is not None and dialogs.total < group_index.dialog_total:
+        return await get_groups_async(engine, group_index, full=True)
+
+    if full:
+        group_index.groups = seen
+        group_index.last_full_sync = time.time()
+    else:
+        group_index.groups.update(seen)
+        for peer_id in evicted:
+            group_index.groups.pop(peer_id, None)
+    group_index.last_dialog_date = newest_date
+    group_index.dialog_total = dialogs.total
+    group_index.save()
+
+    groups = group_index.targets()
+    engine.metrics.observe_group_sync(time.perf_counter() - started, len(groups), full)
+    engine.accounts.update(engine.phone_number, last_sync=time.time(), group_count=len(groups))
+    return groups
+
+async def send_message_to_groups(engine, job, on_start=None):
+    """Sends the job's message to its pending targets, pacing sends by the delay and the server's wait times.
+
+    Every outcome is written to the job's journal, so a stopped or crashed run can be resumed.
+    The message is rendered per target from the job's template, and every pending message
+    is checked against Telegram's limits before anything is sent.
+    `on_start` is called once the run holds the send lock, i.e. has its turn.
+    """
+    async with engine.running(job, on_start):
+        await _send_job(engine, job)
+
+async def _send_job(engine, job):
+    client = engine.client
+    run_started = time.time()
+    # Rendering every target can take seconds on a big run; keep the loop (and the keepalive) free.
+    targets = [record for _, record in job.pending_targets()]
+    error = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: check_template(job.message, job.parse_mode, job.variables_file, targets, job.attachments, now=run_started))
+    if error:
+        job.close()
+        engine.log(f"❌ Error: {error}")
+        return
+    template = MessageTemplate.for_job(job, now=run_started)
+    connection = engine.connection
+    if not await connection.ensure_connected():
+        job.close()
+        engine.log("\n--- Process stopped by user! ---")
+        return
+
+    digests = []
+    sent_index = None
+    content_keys = {}
+    if engine.dedup_window:
+        try:
+            if job.attachments:
+                loop = asyncio.get_running_loop()
+                digests = await loop.run_in_executor(None, lambda: [file_digest(p) for p in job.attachments])
+            sent_index, content_keys = _skip_duplicates(engine, job, template, digests)
+        except Exception:
+            job.close()
+            raise
+
+    try:
+        cache = PreflightCache(job.phone_number).load()
+        not_before = await _drop_unpostable(engine, job, client, cache)
+    except Exception:
+        job.close()
+        if sent_index:
+            sent_index.close()
+        raise
+
+    pending = job.pending_targets()
+    pacer = SendPacer(pending, job.delay_seconds,
+                      {position: not_before[index] for position, (index, _) in enumerate(pending) if index in not_before})
+    stopped = False
+    media = None
+    metrics = engine.metrics
+    history = engine.history
+    metrics.start_run(job.path, len(pacer))
+
+    # Telethon would otherwise sleep through short flood/slow-mode waits inside send_message,
+    # stalling the whole run on one chat. Let the pacer see them instead.
+    flood_sleep_threshold = client.flood_sleep_threshold
+    client.flood_sleep_threshold = 0
+    try:
+        if job.attachments:
+            # Upload once here; every target below reuses the same files.
+            media = MediaUploader(client, job.phone_number, job.attachments, digests)
+            if not await engine.unless_stopped(media.prepare()):
+                stopped = True
+            else:
+                engine.log(f"📎 {len(job.attachments)} attachment(s) ready: {media.uploaded} uploaded, {media.reused} reused from cache.")
+
+        while pacer:
+            if engine.stop_requested:
+                stopped = True
+                break
+
+            wait, target = pacer.next_target()
+            index, record = target
+            title = record.title
+            metrics.set_queue_depth(len(pacer) + 1)
+            # Returns at once when nothing is left to wait for; a paused run holds here,
+            # and so does one whose connection is being restored.
+            if not await engine.wait_to_send(wait) or not await connection.ensure_connected():
+                stopped = True
+                break
+
+            entity = record.input_peer()
+            text, entities = template.render(record)
+            generation = connection.generation
+            sent_at = time.perf_counter()
+            try:
+                # Send the message
+                if media:
+                    await media.send(entity, text, template.telethon_parse_mode, entities)
+                else:
+                    await client.send_message(entity, text, parse_mode=template.telethon_parse_mode,
+                                              formatting_entities=entities)
+                latency = time.perf_counter() - sent_at
+                metrics.observe_send(latency, title)
+                pacer.sent()
+                job.mark(index, "sent")
+                history.record(job.phone_number, job.path, record, "sent", latency=latency)
+                if sent_index:
+                    sent_index.record(record.peer_id, content_keys[index])
+                cache.sent(record)
+                engine.log(f"✅ Sent to: {title}")
+                engine.emit("sent", title=title)
+
+            except FloodWaitError as e:
+                latency = time.perf_counter() - sent_at
+                metrics.observe_send(latency, title, type(e).__name__)
+                metrics.add_flood_wait(e.seconds)
+                history.record(job.phone_number, job.path, record, "flood_wait", type(e).__name__, latency, e.seconds)
+                if pacer.flood_wait(target, e.seconds):
+                    engine.log(f"⏳ Flood wait of {e.seconds}s, {title} will be retried.")
+                else:
+                    job.mark(index, "skipped", "flood wait")
+                    history.record(job.phone_number, job.path, record, "skipped", "flood wait")
+                    engine.log(f"❌ Skipped {title}: too many flood waits.")
+            except SlowModeWaitError as e:
+                latency = time.perf_counter() - sent_at
+                metrics.observe_send(latency, title, type(e).__name__)
+                history.record(job.phone_number, job.path, record, "slow_mode", type(e).__name__, latency)
+                cache.slow_mode(record, e.seconds)
+                if pacer.slow_mode(target, e.seconds):
+                    engine.log(f"⏳ Slow mode in {title}, retrying in {e.seconds}s.")
+                else:
+                    job.mark(index, "skipped", "slow mode")
+                    history.record(job.phone_number, job.path, record, "skipped", "slow mode")
+                    engine.log(f"❌ Skipped {title}: still in slow mode.")
+            except CONNECTION_ERRORS as e:
+                # The chat isn't at fault: send to it again once the connection is back.
+                metrics.observe_send(time.perf_counter() - sent_at, title, type(e).__name__)
+                pacer.put_back(target)
+                engine.log(f"🔌 Lost the connection while sending to {title}, it will be retried.")
+                if not await connection.reconnect(generation):
+                    stopped = True
+                    break
+            except Exception as e:
+                latency = time.perf_counter() - sent_at
+                metrics.observe_send(latency, title, type(e).__name__)
+                history.record(job.phone_number, job.path, record, "failed", type(e).__name__, latency)
+                pacer.failed()
+                kind = blocked_kind(e)
+                if kind:
+                    # Remembered, so the next run skips this chat without trying.
+                    cache.block(record, kind)
+                job.mark(index, "failed", str(e))
+                engine.log(f"❌ Error sending to {title}: {e}")
+        if not stopped:
+            job.finish()
+    finally:
+        client.flood_sleep_threshold = flood_sleep_threshold
+        # An unfinished journal stays on disk so the job can be resumed later.
+        job.close()
+        if sent_index:
+            sent_index.close()
+        cache.save()
+        history.flush()
+        metrics.end_run(stopped or bool(pacer))
+
+    if stopped:
+        engine.log("\n--- Process stopped by user! ---")
+    else:
+        engine.log("\n--- All messages sent successfully! ---")
+
+def _skip_duplicates(engine, job, template, attachment_digests):
+    """Marks pending targets that already got this exact message within the window as skipped.
+
+    Returns the SentIndex to record new sends in, and the content key of every target left.
+    """
+    sent_index = SentIndex(job.phone_number, engine.dedup_window).load()
+    content_keys = {}
+    duplicates = 0
+    for index, record in job.pending_targets():
+        key = content_key(template.source_for(record), job.parse_mode, attachment_digests)
+        if sent_index.seen(record.peer_id, key):
+            job.mark(index, "skipped", "duplicate")
+            engine.history.record(job.phone_number, job.path, record, "skipped", "duplicate")
+            duplicates += 1
+        else:
+            content_keys[index] = key
+    if duplicates:
+        engine.log(f"⏭ Skipped {duplicates} group(s) that already got this message in the last {engine.dedup_window / 3600:g}h.")
+    return sent_index, content_keys
+
+async def _drop_unpostable(engine, job, client, cache):
+    """Marks pending targets this account can't post in as skipped, before any message goes out.
+
+    Returns {index: unix time} for slow-mode chats that can't take a message yet.
+    """
+    pruned, not_before = await preflight(client, cache, job.pending_targets(), bool(job.attachments))
+    for index, record, reason in pruned:
+        job.mark(index, "skipped", reason)
+        engine.history.record(job.phone_number, job.path, record, "skipped", reason)
+    if pruned:
+        engine.log(f"🚫 Skipped {len(pruned)} group(s) where this account can't post: "
+                   + ", ".join(record.title for _, record, _ in pruned[:5])
+                   + (", ..." if len(pruned) > 5 else ""))
+    if not_before:
+        engine.log(f"🐢 {len(not_before)} group(s) in slow mode will be sent to when their wait ends.")
+    return not_before
+
+async def attempt_telethon_login(engine, api_id, api_hash, phone_number):
+    """Handles the async login process with Telethon."""
+    try:
+        # A recently used account still has a connected client in the pool.
+        started = time.perf_counter()
+        engine.phone_number = phone_number
+        client, reused = await engine.pool.acquire(phone_number, api_id, api_hash)
+        engine.client = client
+        engine.metrics.observe_connect(time.perf_counter() - started, phone_number, reused)
+
+        if await maybe_await(client.is_user_authorized()):
+            engine.accounts.update(phone_number, last_login=time.time())
+            return "authorized"
+        else:
+            return "phone_required"
+    except Exception as e:
+        return f"Error: {e}"
+
+async def send_phone_code(engine, phone_number):
+    """Sends the verification code to the given phone number."""
+    try:
+        engine.sent_code_hash = (await engine.client.send_code_request(phone_number)).phone_code_hash
+        return "code_sent"
+    except Exception as e:
+        return f"Error: {e}"
+
+async def verify_phone_code(engine, phone_number, phone_code):
+    """Verifies the phone code to complete login."""
+    client = engine.client
+    try:
+        await client.sign_in(phone=phone_number, code=phone_code, phone_code_hash=engine.sent_code_hash)
+
+        if await maybe_await(client.is_user_authorized()):
+            engine.accounts.update(phone_number, last_login=time.time())
+            return "authorized"
+        else:
+            return "Failed to sign in."
+    except Exception as e:
+        return f"Error: {e}"
+
+async def perform_logout(engine):
+    """Logs the account out of Telegram. A send run in progress is stopped first, so it can be resumed."""
+    if engine.send_lock.locked():
+        engine.request_stop()
+    async with engine.send_lock:
+        client = engine.client
+        try:
+            if await is_client_connected(client):
+                await client.log_out()
+                # The session is gone; drop the client instead of keeping it pooled.
+                await engine.pool.discard(engine.phone_number)
+                engine.client = None
+                return "success"
+            else:
+                return "not_connected"
+        except Exception as e:
+            return f"Error: {e}"
+
+async def disconnect_client(engine):
+    """Disconnects every pooled client of the engine. Used on shutdown."""
+    await engine.pool.close()
+    engine.client = None
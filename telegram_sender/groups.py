@@ -0,0 +1,136 @@
+"""Per-account group index and the compact records used to address groups."""
+import os
+import time
+
+from telethon import utils
+from telethon.tl.types import InputPeerChannel, InputPeerChat
+
+from .accounts import session_path
+from .jsonfile import load_json, save_json
+
+GROUP_INDEX_SUFFIX = '.groups.json'
+# GroupRecord.rights flags, worked out from the dialog entity during sync.
+CAN_SEND_TEXT = 1
+CAN_SEND_MEDIA = 2
+SLOW_MODE = 4  # slow mode is on and applies to us (admins are exempt)
+# A full dialog walk is still needed now and then to evict groups the account has left.
+FULL_SYNC_INTERVAL = 6 * 60 * 60
+
+class GroupRecord:
+    """Compact target record: just enough to address a group, without its Telethon entity.
+
+    Full entities drag in photos, restrictions and admin rights; a slotted record
+    holds only ids, type and title, and builds the InputPeer when a message is sent.
+    """
+    __slots__ = ("peer_id", "id", "access_hash", "type", "title", "members", "last_activity", "rights")
+
+    def __init__(self, peer_id, id, access_hash, type, title, members=None, last_activity=0, rights=None):
+        self.peer_id = peer_id  # marked id, unique across chats and channels
+        self.id = id
+        self.access_hash = access_hash
+        self.type = type  # "channel" (supergroup) or "chat" (basic group)
+        self.title = title
+        self.members = members
+        self.last_activity = last_activity
+        self.rights = rights  # CAN_SEND_* and SLOW_MODE flags, None if unknown
+
+    @classmethod
+    def from_peer(cls, peer, title, members=None, last_activity=0, rights=None):
+        peer_id = utils.get_peer_id(peer)
+        if isinstance(peer, InputPeerChannel):
+            return cls(peer_id, peer.channel_id, peer.access_hash, "channel", title, members, last_activity, rights)
+        return cls(peer_id, peer.chat_id, None, "chat", title, members, last_activity, rights)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["peer_id"], data["id"], data["access_hash"], data["type"], data["title"],
+                   data.get("members"), data.get("last_activity", 0), data.get("rights"))
+
+    def to_dict(self):
+        """Plain dict that can be stored as JSON."""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def input_peer(self):
+        """Builds the input peer to pass to send_message."""
+        if self.type == "channel":
+            return InputPeerChannel(self.id, self.access_hash)
+        return InputPeerChat(self.id)
+
+def rights_from_entity(entity):
+    """Works out what we may post in a Chat or Channel from its default and our own banned rights."""
+    if getattr(entity, 'creator', False) or getattr(entity, 'admin_rights', None):
+        return CAN_SEND_TEXT | CAN_SEND_MEDIA  # admins bypass restrictions and slow mode
+    now = time.time()
+    banned = []
+    for rights in (getattr(entity, 'default_banned_rights', None), getattr(entity, 'banned_rights', None)):
+        # until_date 0 (or none) means the restriction never expires
+        if rights and not (rights.until_date and 0 < rights.until_date.timestamp() < now):
+            banned.append(rights)
+
+    def forbids(*names):
+        return any(getattr(rights, name, False) for rights in banned for name in names)
+
+    flags = 0
+    if not forbids('view_messages', 'send_messages', 'send_plain'):
+        flags |= CAN_SEND_TEXT
+    if not forbids('view_messages', 'send_messages', 'send_media'):
+        flags |= CAN_SEND_MEDIA
+    if getattr(entity, 'slowmode_enabled', False):
+        flags |= SLOW_MODE
+    return flags
+
+class GroupIndex:
+    """Persistent per-account cache of the groups an account can send to.
+
+    Stored next to the session file so the main screen can be filled instantly,
+    then refreshed incrementally from the dialogs that changed since the last sync.
+    """
+    def __init__(self, phone_number):
+        self.path = f"{session_path(phone_number)}{GROUP_INDEX_SUFFIX}"
+        self.groups = {}  # marked peer id -> GroupRecord
+        self.last_dialog_date = 0
+        self.last_full_sync = 0
+        self.dialog_total = None
+
+    def load(self):
+        """Loads the index from disk. A missing or corrupt file gives an empty index."""
+        data = load_json(self.path, {})
+        try:
+            self.groups = {g["peer_id"]: GroupRecord.from_dict(g) for g in data.get("groups", [])}
+            self.last_dialog_date = data.get("last_dialog_date", 0)
+            self.last_full_sync = data.get("last_full_sync", 0)
+            self.dialog_total = data.get("dialog_total")
+        except (AttributeError, KeyError, TypeError):
+            self.groups = {}
+        return self
+
+    def save(self):
+        data = {
+            "last_dialog_date": self.last_dialog_date,
+            "last_full_sync": self.last_full_sync,
+            "dialog_total": self.dialog_total,
+            "groups": [g.to_dict() for g in self.groups.values()],
+        }
+        save_json(self.path, data)
+
+    def needs_full_sync(self):
+        return not self.groups or time.time() - self.last_full_sync > FULL_SYNC_INTERVAL
+
+    def targets(self, peer_ids=None):
+        """Returns the group records to send to; only those in `peer_ids` if it is given."""
+        if peer_ids is None:
+            return list(self.groups.values())
+        return [g for g in self.groups.values() if g.peer_id in peer_ids]
+
+    @staticmethod
+    def record_from_dialog(d):
+        """Builds an index record from a Telethon dialog. The entity itself is not kept."""
+        # Members and activity feed the group picker's filters; channels often don't report a member count.
+        return GroupRecord.from_peer(utils.get_input_peer(d.entity), d.title,
+                                     members=getattr(d.entity, 'participants_count', None),
+                                     last_activity=d.date.timestamp() if d.date else 0,
+                                     rights=rights_from_entity(d.entity))
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
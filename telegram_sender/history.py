@@ -0,0 +1,150 @@
+"""Run history: every send outcome in SQLite, with aggregate reports and CSV export."""
+import csv
+import threading
+import time
+
+from .sqlitefile import SQLiteStore
+
+HISTORY_DB = 'history.db'
+# Outcomes are buffered and written in one transaction at most this often, or at the end of a run.
+HISTORY_FLUSH_EVERY = 200
+HISTORY_FLUSH_INTERVAL = 5.0
+# Outcomes that cost an API call; skipped targets never reached Telegram.
+ATTEMPT_STATUSES = ("sent", "failed", "flood_wait", "slow_mode")
+HISTORY_COLUMNS = ("ts", "phone", "job", "peer_id", "title", "status", "error", "latency", "flood_wait")
+
+class RunHistory(SQLiteStore):
+    """Send outcomes of every run, for every account, in one SQLite table.
+
+    A row is one outcome: "sent", "failed", "skipped" (with the reason in
+    `error`), or "flood_wait" / "slow_mode" for a rate-limited attempt that was
+    retried later. `error` holds the exception type, `latency` the API call time
+    in seconds and `flood_wait` the wait Telegram asked for. `peer_id` is NULL
+    for a target file entry that never resolved to a chat. Reports are
+    aggregate queries over the table, indexed by account and time. The engine
+    records from the asyncio loop while the GUI reads from the Tk thread.
+    """
+    SCHEMA = """CREATE TABLE IF NOT EXISTS sends (
+                    ts REAL NOT NULL,
+                    phone TEXT NOT NULL,
+                    job TEXT,
+                    peer_id INTEGER,
+                    title TEXT,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    latency REAL,
+                    flood_wait INTEGER);
+                CREATE INDEX IF NOT EXISTS sends_phone_ts ON sends (phone, ts);"""
+
+    def __init__(self, path=HISTORY_DB):
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def record(self, phone_number, job_path, record, status, error=None, latency=None, flood_wait=None):
+        """Buffers one outcome for a GroupRecord; see HISTORY_FLUSH_EVERY."""
+        row = (time.time(), phone_number, job_path, record.peer_id, record.title, status, error,
+               None if latency is None else round(latency, 4), flood_wait)
+        with self._lock:
+            self._pending.append(row)
+        if len(self._pending) >= HISTORY_FLUSH_EVERY or time.monotonic() - self._last_flush >= HISTORY_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if rows:
+            with self._connect() as db:
+                db.executemany(f"INSERT INTO sends ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})", rows)
+
+    # --- Reports ---
+
+    def group_stats(self, phone_number, since=0, limit=20):
+        """Per-group attempts, sends, success rate and mean latency; the least successful groups first."""
+        return self._query(f"""
+            SELECT peer_id, title, attempts, sent, 1.0 * sent / attempts AS success_rate, avg_latency, last_sent
+            FROM (SELECT peer_id, MAX(title) AS title,
+                         SUM(status IN {ATTEMPT_STATUSES}) AS attempts,
+                         SUM(status = 'sent') AS sent,
+                         AVG(CASE WHEN status = 'sent' THEN latency END) AS avg_latency,
+                         MAX(CASE WHEN status = 'sent' THEN ts END) AS last_sent
+                  FROM sends WHERE phone = ? AND ts >= ? AND peer_id IS NOT NULL GROUP BY peer_id)
+            WHERE attempts > 0
+            ORDER BY success_rate, attempts DESC LIMIT ?""", (phone_number, since, limit))
+
+    def slowest_groups(self, phone_number, since=0, limit=10):
+        """Groups by mean latency of their successful sends, slowest first."""
+        return self._query("""
+            SELECT peer_id, MAX(title) AS title, COUNT(*) AS sent, AVG(latency) AS avg_latency, MAX(latency) AS max_latency
+            FROM sends WHERE phone = ? AND ts >= ? AND status = 'sent' AND latency IS NOT NULL
+            GROUP BY peer_id ORDER BY avg_latency DESC LIMIT ?""", (phone_number, since, limit))
+
+    def error_trend(self, phone_number, since=0):
+        """Errors and rate limits per local day and error type, oldest day first."""
+        return self._query("""
+            SELECT date(ts, 'unixepoch', 'localtime') AS day, status, error, COUNT(*) AS count,
+                   COALESCE(SUM(flood_wait), 0) AS flood_wait
+            FROM sends WHERE phone = ? AND ts >= ? AND status IN ('failed', 'flood_wait', 'slow_mode')
+            GROUP BY day, status, error ORDER BY day, count DESC""", (phone_number, since))
+
+    def totals(self, phone_number, since=0):
+        """Overall counts by status, plus the total flood wait in seconds."""
+        rows = self._query("""
+            SELECT status, COUNT(*) AS count, COALESCE(SUM(flood_wait), 0) AS flood_wait
+            FROM sends WHERE phone = ? AND ts >= ? GROUP BY status""", (phone_number, since))
+        totals = {row["status"]: row["count"] for row in rows}
+        totals["flood_wait_seconds"] = sum(row["flood_wait"] for row in rows)
+        return totals
+
+    def export_csv(self, path, phone_number=None, since=0):
+        """Writes the outcomes (of one account, or all) to a CSV file. Returns the number of rows."""
+        self.flush()
+        query = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM sends WHERE ts >= ?"
+        params = [since]
+        if phone_number:
+            query += " AND phone = ?"
+            params.append(phone_number)
+        count = 0
+        with self._connect() as db, open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(("time",) + HISTORY_COLUMNS)
+            for row in db.execute(query + " ORDER BY ts", params):
+                writer.writerow((time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["ts"])),) + tuple(row))
+                count += 1
+        return count
+
+    def _query(self, query, params):
+        self.flush()
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(query, params)]
+
+def summary_text(history, phone_number, since=0, limit=10):
+    """The built-in report as plain text lines, shared by the GUI and the command line."""
+    totals = history.totals(phone_number, since)
+    attempts = sum(totals.get(status, 0) for status in ATTEMPT_STATUSES)
+    if not attempts and not totals.get("skipped"):
+        return ["No sends recorded in this period."]
+    sent = totals.get("sent", 0)
+    lines = [f"{sent} sent of {attempts} attempts ({sent / attempts:.0%})" if attempts else "No attempts.",
+             f"{totals.get('failed', 0)} failed, {totals.get('skipped', 0)} skipped, "
+             f"{totals.get('flood_wait', 0) + totals.get('slow_mode', 0)} rate limited "
+             f"({totals['flood_wait_seconds']}s of flood wait)", ""]
+
+    lines.append("Least successful groups:")
+    for row in history.group_stats(phone_number, since, limit):
+        lines.append(f"  {row['success_rate']:>4.0%}  {row['sent']}/{row['attempts']}  {row['title']}")
+
+    lines += ["", "Slowest groups (mean / max send time):"]
+    for row in history.slowest_groups(phone_number, since, limit):
+        lines.append(f"  {row['avg_latency'] * 1000:>6.0f} ms / {row['max_latency'] * 1000:.0f} ms  {row['title']}")
+
+    lines += ["", "Errors by day:"]
+    trend = history.error_trend(phone_number, since)
+    for row in trend:
+        wait = f", {row['flood_wait']}s waited" if row["flood_wait"] else ""
+        lines.append(f"  {row['day']}  {row['count']:>4} x {row['error'] or row['status']}{wait}")
+    if not trend:
+        lines.append("  none")
+    return lines
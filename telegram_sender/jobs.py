@@ -0,0 +1,260 @@
+"""Resumable send jobs backed by an append-only journal."""
+import json
+import os
+import time
+
+from .groups import GroupRecord
+
+JOBS_DIR = 'send_jobs'
+# Journal records are flushed to the OS immediately but only fsynced in batches.
+JOURNAL_FSYNC_EVERY = 50
+JOURNAL_FSYNC_INTERVAL = 2.0
+# Journals of runs over a target file; kept apart so SendJob never replays them.
+STREAM_JOURNAL_SUFFIX = '.stream.log'
+# How much of a stream journal's end is read to find where the run got to.
+STREAM_JOURNAL_TAIL = 4096
+
+def _create_journal(phone_number, suffix):
+    """Creates a new, empty journal named after the account and the current time. Returns (path, file).
+
+    Jobs created in the same second get a counter after the time: two jobs
+    sharing a journal would replay each other's outcomes. The counter keeps
+    the names in creation order.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job_id = time.strftime("%Y%m%d-%H%M%S")
+    for attempt in range(100):
+        name = f"{phone_number}_{job_id}{f'_{attempt:02d}' if attempt else ''}{suffix}"
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            return path, open(path, 'x', encoding='utf-8')
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"Too many jobs created at {job_id}.")
+
+class SendJob:
+    """A send run backed by an append-only journal, so it can be resumed after a stop or crash.
+
+    The first line of the journal holds the message template, attachments, delay and target list; every
+    following line records the outcome of one target. Targets without a line are
+    still pending.
+    """
+    def __init__(self, path, phone_number, message, delay_seconds, targets, attachments=(),
+                 parse_mode="markdown", variables_file=None):
+        self.path = path
+        self.phone_number = phone_number
+        self.message = message  # a MessageTemplate source, rendered per target
+        self.parse_mode = parse_mode
+        self.variables_file = variables_file  # CSV of per-chat template variables
+        self.attachments = list(attachments)  # file paths, sent as an album if there are several
+        self.delay_seconds = delay_seconds
+        self.targets = targets  # list of GroupRecord
+        self.status = {}  # target index -> "sent" | "failed" | "skipped"
+        self.finished = False
+        self._file = None
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    @classmethod
+    def create(cls, phone_number, message, delay_seconds, groups_list, attachments=(),
+               parse_mode="markdown", variables_file=None):
+        """Starts a new job for the given group records and writes its header."""
+        path, journal = _create_journal(phone_number, '.jsonl')
+        targets = list(groups_list)
+        attachments = [os.path.abspath(p) for p in attachments]
+        if variables_file:
+            variables_file = os.path.abspath(variables_file)
+        job = cls(path, phone_number, message, delay_seconds, targets, attachments, parse_mode, variables_file)
+        job._file = journal
+        job._append({"type": "job", "phone": phone_number, "message": message, "attachments": attachments,
+                     "parse_mode": parse_mode, "variables": variables_file,
+                     "delay": delay_seconds, "targets": [t.to_dict() for t in targets]})
+        job._sync()
+        return job
+
+    @classmethod
+    def load(cls, path):
+        """Replays a journal. A line cut short by a crash is ignored."""
+        job = None
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("type") == "job":
+                    targets = [GroupRecord.from_dict(t) for t in record["targets"]]
+                    job = cls(path, record["phone"], record["message"], record["delay"], targets,
+                              record.get("attachments", []), record.get("parse_mode", "markdown"),
+                              record.get("variables"))
+                elif job is None:
+                    continue
+                elif record.get("type") == "done":
+                    job.finished = True
+                else:
+                    job.status[record["t"]] = record["s"]
+        return job
+
+    @classmethod
+    def latest_unfinished(cls, phone_number):
+        """Returns the most recent job of this account that still has pending targets, or None."""
+        if not os.path.isdir(JOBS_DIR):
+            return None
+        prefix = f"{phone_number}_"
+        names = sorted((n for n in os.listdir(JOBS_DIR) if n.startswith(prefix) and n.endswith('.jsonl')), reverse=True)
+        for name in names:
+            path = os.path.join(JOBS_DIR, name)
+            if cls._ends_with_done(path):
+                continue
+            job = cls.load(path)
+            if job and not job.finished and job.pending_targets():
+                return job
+        return None
+
+    @staticmethod
+    def _ends_with_done(path):
+        """Checks the tail of a journal for the done record without replaying it."""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 64, 0))
+            return f.read().rstrip().endswith(b'{"type": "done"}')
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read() == b"\n"
+
+    def pending_targets(self):
+        """Returns (target index, GroupRecord) for every target without an outcome yet."""
+        return [(i, t) for i, t in enumerate(self.targets) if i not in self.status]
+
+    def mark(self, index, status, error=None):
+        """Records the outcome of one target."""
+        self.status[index] = status
+        record = {"t": index, "s": status}
+        if error:
+            record["e"] = error
+        self._record_outcome(record)
+
+    def finish(self):
+        """Marks the job as complete and closes the journal."""
+        self.finished = True
+        self._append({"type": "done"})
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def delete(self):
+        """Closes and removes the journal of a job that never started, so it isn't offered for resuming."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _record_outcome(self, record):
+        self._append(record)
+        self._unsynced += 1
+        if self._unsynced >= JOURNAL_FSYNC_EVERY or time.monotonic() - self._last_fsync >= JOURNAL_FSYNC_INTERVAL:
+            self._sync()
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if not self._ends_with_newline(self.path):
+                self._file.write("\n")  # end a line cut short by a crash, or the next record would join it
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+class StreamJob(SendJob):
+    """A send run over a target file that is read as it goes, so it never holds the target list.
+
+    The journal header names the file instead of listing targets, and every
+    outcome line records the byte offset just past its target's line. Targets
+    are sent in file order, so the last offset in the journal is where a
+    resumed run starts reading again.
+    """
+    def __init__(self, path, phone_number, message, delay_seconds, target_file, attachments=(),
+                 parse_mode="markdown", variables_file=None, offset=0):
+        super().__init__(path, phone_number, message, delay_seconds, [], attachments, parse_mode, variables_file)
+        self.target_file = target_file
+        self.offset = offset
+
+    @classmethod
+    def create(cls, phone_number, message, delay_seconds, target_file, attachments=(),
+               parse_mode="markdown", variables_file=None):
+        """Starts a new job over `target_file` and writes its header."""
+        path, journal = _create_journal(phone_number, STREAM_JOURNAL_SUFFIX)
+        target_file = os.path.abspath(target_file)
+        attachments = [os.path.abspath(p) for p in attachments]
+        if variables_file:
+            variables_file = os.path.abspath(variables_file)
+        job = cls(path, phone_number, message, delay_seconds, target_file, attachments, parse_mode, variables_file)
+        job._file = journal
+        job._append({"type": "stream", "phone": phone_number, "message": message, "attachments": attachments,
+                     "parse_mode": parse_mode, "variables": variables_file,
+                     "delay": delay_seconds, "file": target_file})
+        job._sync()
+        return job
+
+    @classmethod
+    def load(cls, path):
+        """Reads the header and the last recorded offset, without replaying the whole journal."""
+        with open(path, 'rb') as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - STREAM_JOURNAL_TAIL, 0))
+            tail = f.read().splitlines()
+        if header.get("type") != "stream":
+            return None
+        job = cls(path, header["phone"], header["message"], header["delay"], header["file"],
+                  header.get("attachments", []), header.get("parse_mode", "markdown"), header.get("variables"))
+        for line in reversed(tail):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # cut short by a crash, or the start of a line cut off by the tail
+            if record.get("type") == "done":
+                job.finished = True
+            elif "o" in record:
+                job.offset = record["o"]
+            else:
+                continue
+            break
+        return job
+
+    @classmethod
+    def latest_unfinished(cls, phone_number):
+        """Returns the most recent unfinished target file run of this account, or None."""
+        if not os.path.isdir(JOBS_DIR):
+            return None
+        prefix = f"{phone_number}_"
+        names = sorted((n for n in os.listdir(JOBS_DIR) if n.startswith(prefix) and n.endswith(STREAM_JOURNAL_SUFFIX)),
+                       reverse=True)
+        for name in names:
+            job = cls.load(os.path.join(JOBS_DIR, name))
+            if job and not job.finished:
+                return job
+        return None
+
+    def mark(self, offset, status, error=None):
+        """Records the outcome of the target whose line ends at byte `offset`."""
+        self.offset = offset
+        record = {"o": offset, "s": status}
+        if error:
+            record["e"] = error
+        self._record_outcome(record)
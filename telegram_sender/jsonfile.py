@@ -0,0 +1,26 @@
+"""Small per-account JSON files: read leniently, replaced atomically."""
+import json
+import os
+
+def load_json(path, default):
+    """Returns the file's contents, or `default` if it is missing or corrupt."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return default
+
+def save_json(path, data):
+    """Writes `data` to a temporary file and renames it into place.
+
+    The temporary file is fsynced first: otherwise a crash shortly after the
+    rename can leave an empty file behind, which would load as `default`.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,57 @@
+"""Thread-safe log and counter queue for front ends, backed by a rotating log file."""
+import logging
+import logging.handlers
+import queue
+
+LOG_FILE = 'sender.log'
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+# How often consumers are expected to drain the sink.
+LOG_DRAIN_INTERVAL_MS = 100
+
+class LogSink:
+    """Thread-safe queue of log lines and counter updates for the UI.
+
+    Any thread can push events; the UI drains them on a fixed tick so that many
+    lines become one textbox insert and one label update. Every line is also
+    streamed to a rotating log file by a background listener thread.
+    """
+    def __init__(self, log_file=LOG_FILE):
+        self._events = queue.SimpleQueue()
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log_queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(log_queue, file_handler)
+        self._listener.start()
+        self._logger = logging.getLogger("telegram_sender")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._handler = logging.handlers.QueueHandler(log_queue)
+        self._logger.addHandler(self._handler)
+
+    def log(self, text):
+        self._events.put(("log", text))
+        self._logger.info(text)
+
+    def count_sent(self, n=1):
+        self._events.put(("sent", n))
+
+    def drain(self):
+        """Returns (lines, sent increment) for everything queued since the last drain."""
+        lines = []
+        sent = 0
+        while True:
+            try:
+                kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                lines.append(value)
+            else:
+                sent += value
+        return lines, sent
+
+    def close(self):
+        self._logger.removeHandler(self._handler)
+        self._listener.stop()
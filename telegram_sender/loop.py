@@ -0,0 +1,29 @@
+"""Background asyncio loop used by the GUI to run Telegram coroutines."""
+import asyncio
+import threading
+
+class AsyncLoopThread:
+    """Runs one long-lived asyncio event loop in a background thread.
+
+    The Telethon client stays bound to this loop for the whole lifetime of the
+    app, and several coroutines (sending, group reloads, logout) can run on it
+    at the same time instead of queueing behind each other.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop and returns a cancellable concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=5):
+        """Stops the loop and waits for the background thread to exit."""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
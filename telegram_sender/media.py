@@ -0,0 +1,166 @@
+"""Attachments for send runs: uploaded once per run and reused for every target.
+
+The media references Telegram returns after the first send are cached per account,
+keyed by the SHA-256 of the file contents, so an unchanged file is not uploaded
+again on later runs either.
+"""
+import asyncio
+import hashlib
+import os
+
+from telethon import utils
+from telethon.errors import FileReferenceExpiredError, MediaEmptyError
+from telethon.tl.types import (
+    InputDocument,
+    InputFile,
+    InputFileBig,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputPhoto,
+)
+
+from .accounts import session_path
+from .jsonfile import load_json, save_json
+
+UPLOAD_CACHE_SUFFIX = '.uploads.json'
+# Telegram limits: files per album, and caption length on media messages.
+MAX_ALBUM_SIZE = 10
+MAX_CAPTION_LENGTH = 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def check_attachments(paths):
+    """Returns an error message if the attachments can't be sent, otherwise None.
+
+    The caption is checked per target by templates.check_template.
+    """
+    if len(paths) > MAX_ALBUM_SIZE:
+        return f"An album can hold at most {MAX_ALBUM_SIZE} files."
+    for path in paths:
+        if not os.path.isfile(path):
+            return f"Attachment not found: {path}"
+    return None
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def media_record(input_media):
+    """Turns an InputMediaPhoto/InputMediaDocument into a plain dict that can be stored as JSON."""
+    ref = input_media.id
+    kind = "photo" if isinstance(input_media, InputMediaPhoto) else "document"
+    return {"kind": kind, "id": ref.id, "access_hash": ref.access_hash, "file_reference": ref.file_reference.hex()}
+
+def input_media_from_record(record):
+    """Rebuilds the input media stored by media_record."""
+    file_reference = bytes.fromhex(record["file_reference"])
+    if record["kind"] == "photo":
+        return InputMediaPhoto(InputPhoto(record["id"], record["access_hash"], file_reference))
+    return InputMediaDocument(InputDocument(record["id"], record["access_hash"], file_reference))
+
+class UploadCache:
+    """Per-account map of file content hash -> media reference, stored next to the session file."""
+    def __init__(self, phone_number):
+        self.path = f"{session_path(phone_number)}{UPLOAD_CACHE_SUFFIX}"
+        self.entries = {}
+
+    def load(self):
+        """Loads the cache from disk. A missing or corrupt file gives an empty cache."""
+        self.entries = load_json(self.path, {})
+        return self
+
+    def save(self):
+        save_json(self.path, self.entries)
+
+    def get(self, digest):
+        record = self.entries.get(digest)
+        return input_media_from_record(record) if record else None
+
+    def put(self, digest, input_media):
+        self.entries[digest] = media_record(input_media)
+
+    def discard(self, digest):
+        self.entries.pop(digest, None)
+
+class MediaUploader:
+    """Uploads a run's attachments once and reuses them for every target.
+
+    Files are uploaded with client.upload_file; after the first successful send the
+    uploaded files are swapped for the media references Telegram returned, which
+    later targets (and later runs) can send without any upload at all.
+    """
+    def __init__(self, client, phone_number, paths, digests=None):
+        self.client = client
+        self.paths = list(paths)
+        self.cache = UploadCache(phone_number).load()
+        self.digests = list(digests or ())  # computed by prepare() unless already known
+        self.files = []
+        self.uploaded = 0
+        self.reused = 0
+
+    async def prepare(self):
+        """Hashes every attachment and uploads the ones that aren't cached."""
+        if len(self.digests) != len(self.paths):
+            loop = asyncio.get_running_loop()
+            self.digests = [await loop.run_in_executor(None, file_digest, path) for path in self.paths]
+        self.files = []
+        for path, digest in zip(self.paths, self.digests):
+            cached = self.cache.get(digest)
+            if cached:
+                self.files.append(cached)
+                self.reused += 1
+            else:
+                self.files.append(await self.client.upload_file(path))
+                self.uploaded += 1
+
+    async def send(self, entity, caption, parse_mode=(), entities=None):
+        """Sends the attachments (as an album if there are several) with the caption.
+
+        `entities` are the caption's formatting, already parsed; the caption is then sent as is.
+        """
+        if entities is not None:
+            parse_mode = None  # send_file would parse a caption without entities again
+        try:
+            result = await self.client.send_file(entity, self._file_argument(), caption=caption,
+                                                 parse_mode=parse_mode, formatting_entities=entities)
+        except (FileReferenceExpiredError, MediaEmptyError):
+            # A cached reference went stale; upload those files again and retry once.
+            if not await self._reupload_cached():
+                raise
+            result = await self.client.send_file(entity, self._file_argument(), caption=caption,
+                                                 parse_mode=parse_mode, formatting_entities=entities)
+        self._remember(result)
+        return result
+
+    def _file_argument(self):
+        return self.files[0] if len(self.files) == 1 else self.files
+
+    async def _reupload_cached(self):
+        reuploaded = False
+        for i, file in enumerate(self.files):
+            if not isinstance(file, (InputFile, InputFileBig)):
+                self.cache.discard(self.digests[i])
+                self.files[i] = await self.client.upload_file(self.paths[i])
+                self.uploaded += 1
+                reuploaded = True
+        if reuploaded:
+            self.cache.save()
+        return reuploaded
+
+    def _remember(self, result):
+        """Replaces uploaded files with the media references from the sent message(s)."""
+        if not any(isinstance(file, (InputFile, InputFileBig)) for file in self.files):
+            return
+        messages = result if isinstance(result, list) else [result]
+        if len(messages) != len(self.files):
+            return
+        for i, message in enumerate(messages):
+            if isinstance(self.files[i], (InputFile, InputFileBig)) and message.media:
+                input_media = utils.get_input_media(message.media)
+                if isinstance(input_media, (InputMediaPhoto, InputMediaDocument)):
+                    self.files[i] = input_media
+                    self.cache.put(self.digests[i], input_media)
+        self.cache.save()
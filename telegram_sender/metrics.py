@@ -0,0 +1,231 @@
+"""Run instrumentation: a JSON-lines trace file and a Prometheus-style text endpoint.
+
+The engine records connect and group sync timings, per-message API latency,
+errors by exception type, flood-wait time and queue depth. Counters and
+histograms are cumulative for the endpoint; every send run also writes its own
+summary line to the metrics file.
+"""
+import json
+import os
+import threading
+import time
+
+METRICS_FILE = 'metrics.jsonl'
+# Set to a port number to serve /metrics on 127.0.0.1 (the CLI also takes --metrics-port).
+METRICS_PORT_ENV = 'SENDER_METRICS_PORT'
+# Per-message trace lines are buffered and written out at most this often.
+METRICS_FLUSH_INTERVAL = 5.0
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Fixed-bucket latency histogram, in seconds."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {"buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+                "count": self.count, "sum": round(self.sum, 6)}
+
+class Metrics:
+    """Thread-safe metrics for one engine.
+
+    The engine calls it from the asyncio loop; the HTTP endpoint reads it from
+    its own thread.
+    """
+    def __init__(self, metrics_file=METRICS_FILE):
+        self.metrics_file = metrics_file
+        self._lock = threading.Lock()
+        self._file = None
+        self._last_flush = time.monotonic()
+        self.connect_seconds = None
+        self.group_sync_seconds = None
+        self.groups = 0
+        self.sent_total = 0
+        self.errors_total = {}
+        self.flood_wait_seconds_total = 0
+        self.queue_depth = 0
+        self.send_latency = Histogram()
+        self._run = None
+
+    # --- Hooks used by the engine ---
+
+    def observe_connect(self, seconds, phone_number, reused=False):
+        """`reused` is True when a pooled, already connected client was handed out."""
+        with self._lock:
+            self.connect_seconds = seconds
+        self.record("connect", phone=phone_number, seconds=round(seconds, 4), reused=reused)
+        self.flush()
+
+    def observe_group_sync(self, seconds, groups, full):
+        with self._lock:
+            self.group_sync_seconds = seconds
+            self.groups = groups
+        self.record("group_sync", seconds=round(seconds, 4), groups=groups, full=full)
+        self.flush()
+
+    def start_run(self, job_path, targets):
+        with self._lock:
+            self.queue_depth = targets
+            self._run = {"job": job_path, "started": time.time(), "targets": targets, "sent": 0,
+                         "errors": {}, "flood_wait_seconds": 0, "latency": Histogram()}
+        self.record("run_start", job=job_path, targets=targets)
+
+    def set_queue_depth(self, depth):
+        with self._lock:
+            self.queue_depth = depth
+
+    def observe_send(self, seconds, title, error=None):
+        """Records one send_message/send_file call; `error` is the exception type name if it failed."""
+        with self._lock:
+            self.send_latency.observe(seconds)
+            if self._run:
+                self._run["latency"].observe(seconds)
+            if error is None:
+                self.sent_total += 1
+                if self._run:
+                    self._run["sent"] += 1
+            else:
+                self.errors_total[error] = self.errors_total.get(error, 0) + 1
+                if self._run:
+                    self._run["errors"][error] = self._run["errors"].get(error, 0) + 1
+        self.record("send", chat=title, seconds=round(seconds, 4), error=error)
+
+    def add_flood_wait(self, seconds):
+        with self._lock:
+            self.flood_wait_seconds_total += seconds
+            if self._run:
+                self._run["flood_wait_seconds"] += seconds
+
+    def end_run(self, stopped):
+        with self._lock:
+            run, self._run = self._run, None
+            self.queue_depth = 0
+        if run:
+            latency = run.pop("latency")
+            self.record("run_end", stopped=stopped, duration=round(time.time() - run.pop("started"), 3),
+                        p50=latency.quantile(0.5), p99=latency.quantile(0.99),
+                        latency=latency.to_dict(), **run)
+        self.flush()
+
+    # --- Output ---
+
+    def record(self, event, **fields):
+        """Appends one JSON line to the metrics file; written out in batches."""
+        line = json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.metrics_file, 'a', encoding='utf-8')
+            self._file.write(line + "\n")
+        if time.monotonic() - self._last_flush >= METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._file:
+                self._file.flush()
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def render_prometheus(self):
+        """Renders the current values in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                "# TYPE sender_connect_seconds gauge",
+                f"sender_connect_seconds {self.connect_seconds or 0}",
+                "# TYPE sender_group_sync_seconds gauge",
+                f"sender_group_sync_seconds {self.group_sync_seconds or 0}",
+                "# TYPE sender_groups gauge",
+                f"sender_groups {self.groups}",
+                "# TYPE sender_queue_depth gauge",
+                f"sender_queue_depth {self.queue_depth}",
+                "# TYPE sender_messages_sent_total counter",
+                f"sender_messages_sent_total {self.sent_total}",
+                "# TYPE sender_flood_wait_seconds_total counter",
+                f"sender_flood_wait_seconds_total {self.flood_wait_seconds_total}",
+                "# TYPE sender_send_errors_total counter",
+            ]
+            for name, count in sorted(self.errors_total.items()):
+                lines.append(f'sender_send_errors_total{{type="{name}"}} {count}')
+            lines.append("# TYPE sender_send_latency_seconds histogram")
+            cumulative = 0
+            for bound, n in zip(list(self.send_latency.buckets) + ["+Inf"], self.send_latency.counts):
+                cumulative += n
+                lines.append(f'sender_send_latency_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"sender_send_latency_seconds_sum {self.send_latency.sum}")
+            lines.append(f"sender_send_latency_seconds_count {self.send_latency.count}")
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """Serves Metrics.render_prometheus() at http://127.0.0.1:<port>/metrics from a daemon thread."""
+    def __init__(self, metrics, port):
+        import http.server  # only paid for when the endpoint is enabled
+
+        metrics_ref = metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics_ref.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep scrapes out of stderr
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+
+    @classmethod
+    def from_env(cls, metrics):
+        """Starts a server if METRICS_PORT_ENV is set, otherwise returns None."""
+        port = os.environ.get(METRICS_PORT_ENV)
+        if not port:
+            return None
+        return cls(metrics, int(port)).start()
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,65 @@
+"""Send ordering that honours Telegram's flood and slow-mode waits."""
+import heapq
+import time
+
+# Telegram asks user accounts to stay around one message per second; never go faster than this.
+MIN_SEND_INTERVAL = 1.0
+# How many times a target is put back in the queue after a flood or slow-mode wait.
+MAX_RATE_LIMIT_RETRIES = 3
+
+class SendPacer:
+    """Orders sends so that server-imposed waits are honoured without idling the whole run.
+
+    Targets sit in a min-heap keyed by the time they become eligible. A flood wait
+    blocks the whole account until it expires, while a slow-mode wait only pushes
+    back that one chat, so other chats keep going out in the meantime.
+    """
+    def __init__(self, targets, delay_seconds, not_before=None):
+        """`not_before` maps a target's position to the Unix time it may first be sent (e.g. slow mode)."""
+        self.delay_seconds = max(delay_seconds, MIN_SEND_INTERVAL)
+        # (ready_at, original position, target); positions keep the user's order among ready targets
+        not_before = not_before or {}
+        offset = time.monotonic() - time.time()
+        self._queue = [(not_before[i] + offset if i in not_before else 0.0, i, target) for i, target in enumerate(targets)]
+        heapq.heapify(self._queue)
+        self._retries = {}
+        self.next_send_at = 0.0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def next_target(self):
+        """Pops the next eligible target and returns (seconds to wait, target)."""
+        ready_at, position, target = heapq.heappop(self._queue)
+        self._position = position
+        wait = max(ready_at, self.next_send_at) - time.monotonic()
+        return max(wait, 0.0), target
+
+    def sent(self):
+        self.next_send_at = time.monotonic() + self.delay_seconds
+
+    def failed(self):
+        # A rejected request still counts against the account's rate.
+        self.next_send_at = time.monotonic() + MIN_SEND_INTERVAL
+
+    def flood_wait(self, target, seconds):
+        """Blocks every send for `seconds` and requeues the target. Returns False once it gives up."""
+        self.next_send_at = time.monotonic() + seconds
+        return self._requeue(target, seconds)
+
+    def slow_mode(self, target, seconds):
+        """Pushes back only this chat for `seconds`. Returns False once it gives up."""
+        self.next_send_at = time.monotonic() + MIN_SEND_INTERVAL
+        return self._requeue(target, seconds)
+
+    def put_back(self, target):
+        """Returns the target to the front of the queue without counting a retry, e.g. after a lost connection."""
+        heapq.heappush(self._queue, (0.0, self._position, target))
+
+    def _requeue(self, target, seconds):
+        retries = self._retries.get(self._position, 0)
+        if retries >= MAX_RATE_LIMIT_RETRIES:
+            return False
+        self._retries[self._position] = retries + 1
+        heapq.heappush(self._queue, (time.monotonic() + seconds, self._position, target))
+        return True
@@ -0,0 +1,123 @@
+"""Pool of connected Telegram clients, one per recently used account."""
+import asyncio
+import time
+from collections import OrderedDict
+
+from telethon import TelegramClient
+
+from .accounts import session_path
+from .connection import is_client_connected
+
+# Connected clients kept around for switching back to an account; the least recently used goes first.
+POOL_MAX_CLIENTS = 3
+# Clients not used for this long are disconnected; the active account is never reaped.
+POOL_IDLE_TIMEOUT = 15 * 60
+POOL_REAP_INTERVAL = 60
+
+class PooledClient:
+    __slots__ = ("client", "api_id", "api_hash", "last_used")
+
+    def __init__(self, client, api_id, api_hash):
+        self.client = client
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.last_used = time.monotonic()
+
+class ClientPool:
+    """Bounded LRU pool of connected TelegramClients keyed by phone number.
+
+    Switching back to a pooled account reuses its open connection instead of
+    paying a fresh connect and handshake. All methods run on the event loop the
+    clients were created on.
+    """
+    def __init__(self, max_clients=POOL_MAX_CLIENTS, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.active = None  # phone of the account in use, never evicted
+        self._entries = OrderedDict()  # phone -> PooledClient, least recently used first
+        self._reaper = None
+
+    def __contains__(self, phone_number):
+        return phone_number in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def acquire(self, phone_number, api_id, api_hash):
+        """Returns a connected client for the account and makes it the active one.
+
+        The second value is True if an already connected client was reused.
+        """
+        entry = self._entries.get(phone_number)
+        if entry and (entry.api_id, entry.api_hash) != (api_id, api_hash):
+            # The account was saved again with other credentials; don't hand out the old client.
+            await self.discard(phone_number)
+            entry = None
+
+        reused = entry is not None and await is_client_connected(entry.client)
+        if entry is None:
+            entry = PooledClient(TelegramClient(session_path(phone_number), api_id, api_hash), api_id, api_hash)
+            self._entries[phone_number] = entry
+        if not reused:
+            await entry.client.connect()
+
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(phone_number)
+        self.active = phone_number
+        await self._evict_over_capacity()
+        self._start_reaper()
+        return entry.client, reused
+
+    async def discard(self, phone_number):
+        """Disconnects and forgets an account's client, e.g. after logout or deletion."""
+        entry = self._entries.pop(phone_number, None)
+        if self.active == phone_number:
+            self.active = None
+        if entry:
+            await self._disconnect(entry.client)
+
+    async def reap_idle(self):
+        """Disconnects clients that have been idle longer than the timeout."""
+        now = time.monotonic()
+        idle = [phone for phone, entry in self._entries.items()
+                if phone != self.active and now - entry.last_used > self.idle_timeout]
+        for phone in idle:
+            await self.discard(phone)
+
+    async def close(self):
+        """Disconnects every pooled client."""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        entries, self._entries = list(self._entries.values()), OrderedDict()
+        self.active = None
+        await asyncio.gather(*(self._disconnect(entry.client) for entry in entries))
+
+    def release(self):
+        """Marks the active account as idle, so its client can age out of the pool."""
+        entry = self._entries.get(self.active)
+        if entry:
+            entry.last_used = time.monotonic()
+        self.active = None
+
+    async def _evict_over_capacity(self):
+        while len(self._entries) > self.max_clients:
+            phone = next(p for p in self._entries if p != self.active)
+            await self.discard(phone)
+
+    def _start_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_forever())
+
+    async def _reap_forever(self):
+        while self._entries:
+            await asyncio.sleep(POOL_REAP_INTERVAL)
+            await self.reap_idle()
+
+    @staticmethod
+    async def _disconnect(client):
+        try:
+            if await is_client_connected(client):
+                await client.disconnect()
+        except Exception:
+            pass  # a dead connection is as good as a closed one here
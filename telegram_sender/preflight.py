@@ -0,0 +1,133 @@
+"""Pre-flight pass over a run's targets: drops groups we can't post in before any message goes out.
+
+Posting rights come for free with every group sync (GroupRecord.rights). On top of
+that, a per-account cache keeps slow-mode timings from full channel info and the
+chats that rejected an earlier send. A cache entry is used only while the
+group's rights are unchanged and it is younger than PREFLIGHT_CACHE_TTL.
+"""
+import time
+
+from telethon import functions
+from telethon.errors import FloodWaitError
+from telethon.tl.types import InputChannel
+
+from .accounts import session_path
+from .groups import CAN_SEND_MEDIA, CAN_SEND_TEXT, SLOW_MODE
+from .jsonfile import load_json, save_json
+
+PREFLIGHT_CACHE_SUFFIX = '.preflight.json'
+PREFLIGHT_CACHE_TTL = 6 * 60 * 60
+# Full channel info costs one request per group; look up at most this many per run.
+PREFLIGHT_MAX_LOOKUPS = 100
+
+# Send errors that mean the chat won't take any message from us, or no media.
+TEXT_FORBIDDEN_ERRORS = {
+    "ChatWriteForbiddenError", "ChatAdminRequiredError", "UserBannedInChannelError",
+    "ChatRestrictedError", "ChannelPrivateError", "ChatGuestSendForbiddenError",
+    "ChatSendPlainForbiddenError",
+}
+MEDIA_FORBIDDEN_ERRORS = {
+    "ChatSendMediaForbiddenError", "ChatSendPhotosForbiddenError", "ChatSendVideosForbiddenError",
+    "ChatSendDocsForbiddenError", "ChatSendAudiosForbiddenError",
+}
+
+def blocked_kind(error):
+    """Returns "text" or "media" if the send error means the chat forbids that, otherwise None."""
+    name = type(error).__name__
+    if name in TEXT_FORBIDDEN_ERRORS:
+        return "text"
+    if name in MEDIA_FORBIDDEN_ERRORS:
+        return "media"
+    return None
+
+class PreflightCache:
+    """Per-account cache of slow-mode timings and rejected sends, stored next to the session file."""
+    def __init__(self, phone_number):
+        self.path = f"{session_path(phone_number)}{PREFLIGHT_CACHE_SUFFIX}"
+        self.entries = {}  # str(peer id) -> {"rights", "checked", "slowmode_seconds", "next_send", "blocked"}
+        self.changed = False
+
+    def load(self):
+        """Loads the cache from disk. A missing or corrupt file gives an empty cache."""
+        self.entries = load_json(self.path, {})
+        return self
+
+    def save(self):
+        """Writes the cache, if anything changed."""
+        if not self.changed:
+            return
+        cutoff = time.time() - PREFLIGHT_CACHE_TTL
+        self.entries = {key: entry for key, entry in self.entries.items() if entry["checked"] >= cutoff}
+        save_json(self.path, self.entries)
+        self.changed = False
+
+    def get(self, record):
+        """Returns the record's entry if it is still valid for the record's current rights."""
+        entry = self.entries.get(str(record.peer_id))
+        if entry and entry["rights"] == record.rights and time.time() - entry["checked"] < PREFLIGHT_CACHE_TTL:
+            return entry
+        return None
+
+    def update(self, record, **fields):
+        entry = self.get(record) or {"slowmode_seconds": None, "next_send": None, "blocked": None}
+        entry.update(fields, rights=record.rights, checked=time.time())
+        self.entries[str(record.peer_id)] = entry
+        self.changed = True
+
+    def block(self, record, kind):
+        """Remembers that the chat rejected a send of this kind ("text" or "media")."""
+        self.update(record, blocked=kind)
+
+    def sent(self, record):
+        """Starts the chat's slow-mode interval again after one of our messages went out."""
+        entry = self.get(record)
+        if entry and entry["slowmode_seconds"]:
+            self.update(record, next_send=time.time() + entry["slowmode_seconds"])
+
+    def slow_mode(self, record, seconds):
+        """Remembers when slow mode lets us post in the chat again."""
+        self.update(record, next_send=time.time() + seconds)
+
+async def preflight(client, cache, targets, with_media):
+    """Checks (index, GroupRecord) targets before a run.
+
+    Returns (pruned, not_before): `pruned` lists (index, record, reason) for
+    targets that would be rejected, and `not_before` maps the index of a
+    slow-mode target to the Unix time it can next be posted in.
+    """
+    needed = CAN_SEND_TEXT | CAN_SEND_MEDIA if with_media else CAN_SEND_TEXT
+    pruned = []
+    not_before = {}
+    lookups = []
+    for index, record in targets:
+        if record.rights is not None and record.rights & needed != needed:
+            pruned.append((index, record, "media not allowed" if record.rights & CAN_SEND_TEXT else "posting not allowed"))
+            continue
+        entry = cache.get(record)
+        if entry and (entry["blocked"] == "text" or (with_media and entry["blocked"] == "media")):
+            pruned.append((index, record, f"{entry['blocked']} rejected on an earlier run"))
+            continue
+        if record.rights is not None and record.rights & SLOW_MODE and record.type == "channel":
+            if entry and entry["slowmode_seconds"] is not None:
+                if entry["next_send"] and entry["next_send"] > time.time():
+                    not_before[index] = entry["next_send"]
+            else:
+                lookups.append((index, record))
+
+    for index, record in lookups[:PREFLIGHT_MAX_LOOKUPS]:
+        try:
+            full = await client(functions.channels.GetFullChannelRequest(InputChannel(record.id, record.access_hash)))
+        except FloodWaitError:
+            break  # the run itself copes with slow mode; don't spend the account's rate on this
+        except Exception as e:
+            kind = blocked_kind(e)
+            if kind:
+                cache.block(record, kind)
+                pruned.append((index, record, f"{kind} not allowed"))
+            continue
+        next_send = full.full_chat.slowmode_next_send_date
+        next_send = next_send.timestamp() if next_send else None
+        cache.update(record, slowmode_seconds=full.full_chat.slowmode_seconds or 0, next_send=next_send)
+        if next_send and next_send > time.time():
+            not_before[index] = next_send
+    return pruned, not_before
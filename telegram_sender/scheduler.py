@@ -0,0 +1,296 @@
+"""Scheduled and recurring send jobs.
+
+Each account keeps its schedule in a JSON file next to the session file. While a
+Scheduler runs, the entries sit in a min-heap ordered by their next run time, and
+the scheduler sleeps until the earliest one is due (or the schedule changes)
+instead of polling. Runs missed while the app was closed or the machine was
+asleep are caught up once when the scheduler next looks.
+"""
+import asyncio
+import heapq
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from .accounts import session_path
+from .engine import get_groups_async, send_message_to_groups
+from .groups import GroupIndex
+from .jobs import SendJob
+from .jsonfile import load_json, save_json
+from .media import check_attachments
+
+SCHEDULE_SUFFIX = '.schedule.json'
+# A run more than this late (app closed, machine asleep) is skipped instead of sent.
+SCHEDULE_MISFIRE_GRACE = 6 * 60 * 60
+# The asyncio clock stops while the machine sleeps, so long waits are cut short
+# to compare against the wall clock again.
+SCHEDULER_MAX_SLEEP = 5 * 60
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# minute, hour, day of month, month, day of week (0 or 7 is Sunday)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+CRON_SEARCH_YEARS = 5
+
+class CronSchedule:
+    """A five-field cron expression ("30 9 * * 1-5") or an alias such as @daily, in local time."""
+    def __init__(self, expression):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"'{expression}' is not a cron expression: expected 5 fields.")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(text, low, high) for text, (low, high) in zip(fields, CRON_FIELDS))
+        self.weekdays = {d % 7 for d in weekdays}
+        # As in cron, a restricted day of month and day of week match either way.
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(text, low, high):
+        values = set()
+        for part in text.split(","):
+            body, _, step = part.partition("/")
+            try:
+                if body == "*":
+                    start, end = low, high
+                elif "-" in body:
+                    start, end = (int(v) for v in body.split("-", 1))
+                else:
+                    start = int(body)
+                    end = high if step else start
+                step = int(step) if step else 1
+            except ValueError:
+                raise ValueError(f"Invalid cron field '{text}'.") from None
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"Cron field '{text}' is out of range {low}-{high}.")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        weekday = (dt.weekday() + 1) % 7  # cron counts from Sunday
+        if self.any_day or self.any_weekday:
+            return dt.day in self.days and weekday in self.weekdays
+        return dt.day in self.days or weekday in self.weekdays
+
+    def next_after(self, timestamp):
+        """Returns the first matching minute after `timestamp`, as a timestamp."""
+        dt = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * CRON_SEARCH_YEARS)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError(f"Cron expression '{self.expression}' never matches.")
+
+def parse_run_time(text):
+    """Parses "YYYY-MM-DD HH:MM" in local time into a timestamp."""
+    try:
+        return time.mktime(time.strptime(text.strip(), "%Y-%m-%d %H:%M"))
+    except ValueError:
+        raise ValueError(f"'{text}' is not a time like 2024-05-01 09:30.") from None
+
+class Schedule:
+    """The scheduled jobs of one account, stored next to the session file.
+
+    An entry holds everything SendJob.create needs, except that targets are peer
+    ids (or None for every group) resolved against the group index at run time.
+    """
+    def __init__(self, phone_number):
+        self.phone_number = phone_number
+        self.path = f"{session_path(phone_number)}{SCHEDULE_SUFFIX}"
+        self.entries = {}  # entry id -> entry dict
+        self._heap = []  # (next_run, entry id); stale pairs are skipped when popped
+
+    def load(self):
+        """Loads the schedule from disk. A missing or corrupt file gives an empty schedule."""
+        self.entries = {entry["id"]: entry for entry in load_json(self.path, [])}
+        self._heap = [(entry["next_run"], entry_id) for entry_id, entry in self.entries.items()]
+        heapq.heapify(self._heap)
+        return self
+
+    def save(self):
+        save_json(self.path, sorted(self.entries.values(), key=lambda e: e["next_run"]))
+
+    def add(self, message, delay_seconds, run_at=None, cron=None, targets=None, attachments=(),
+            parse_mode="markdown", variables_file=None):
+        """Adds a job that runs once at `run_at`, or on the `cron` expression. Returns the entry."""
+        if cron:
+            next_run = CronSchedule(cron).next_after(time.time() if run_at is None else run_at - 60)
+        elif run_at is not None:
+            if run_at <= time.time():
+                raise ValueError("That time has already passed.")
+            next_run = run_at
+        else:
+            raise ValueError("A scheduled job needs a run time or a cron expression.")
+        entry = {
+            "id": uuid.uuid4().hex[:8],
+            "message": message,
+            "parse_mode": parse_mode,
+            "variables": os.path.abspath(variables_file) if variables_file else None,
+            "attachments": [os.path.abspath(p) for p in attachments],
+            "delay": delay_seconds,
+            "targets": sorted(targets) if targets is not None else None,
+            "cron": cron,
+            "next_run": next_run,
+            "last_run": None,
+        }
+        self.entries[entry["id"]] = entry
+        heapq.heappush(self._heap, (next_run, entry["id"]))
+        self.save()
+        return entry
+
+    def remove(self, entry_id):
+        if self.entries.pop(entry_id, None) is not None:
+            self.save()
+            return True
+        return False
+
+    def next_run(self):
+        """Returns the earliest next run time, or None if nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Removes and returns the earliest entry due at `now`, or None.
+
+        A recurring entry is put back at its next occurrence after `now`, so
+        several missed occurrences collapse into one run. Both kinds are saved
+        before they run, so a crash mid-run doesn't send the same occurrence
+        twice. Entries are popped one at a time: whatever the caller doesn't
+        get to stays in the schedule.
+        """
+        if self.next_run() is None or self._heap[0][0] > now:
+            return None
+        _, entry_id = heapq.heappop(self._heap)
+        entry = dict(self.entries[entry_id])
+        if entry["cron"]:
+            self.entries[entry_id]["last_run"] = now
+            self.entries[entry_id]["next_run"] = next_run = CronSchedule(entry["cron"]).next_after(now)
+            heapq.heappush(self._heap, (next_run, entry_id))
+        else:
+            del self.entries[entry_id]
+        self.save()
+        return entry
+
+    def put_back(self, entry):
+        """Restores an entry returned by pop_due that didn't get to run."""
+        self.entries[entry["id"]] = entry
+        heapq.heappush(self._heap, (entry["next_run"], entry["id"]))
+        self.save()
+
+    def _drop_stale(self):
+        while self._heap:
+            next_run, entry_id = self._heap[0]
+            entry = self.entries.get(entry_id)
+            if entry and entry["next_run"] == next_run:
+                return
+            heapq.heappop(self._heap)
+
+class Scheduler:
+    """Runs an account's scheduled jobs on the engine while it is logged in.
+
+    A run goes through send_message_to_groups, so it waits for a manual run to
+    finish, reports the same "run" events, and the engine's stop request ends it
+    just like a manual one; the scheduler then waits for the next entry. stop()
+    ends the scheduler itself, cancelling a run that is still syncing groups or
+    waiting for its turn: it would otherwise carry on with whatever account the
+    engine is switched to next. Such a run goes back into the schedule.
+    """
+    def __init__(self, engine, phone_number):
+        self.engine = engine
+        self.schedule = Schedule(phone_number).load()
+        self._changed = asyncio.Event()
+        self._stopped = False
+        self._task = None
+        self._sending = False
+
+    async def add(self, *args, **kwargs):
+        """Schedule.add on the scheduler's loop; wakes the scheduler if the new entry is earlier."""
+        entry = self.schedule.add(*args, **kwargs)
+        self._changed.set()
+        return entry
+
+    async def remove(self, entry_id):
+        removed = self.schedule.remove(entry_id)
+        self._changed.set()
+        return removed
+
+    def stop(self):
+        """Ends run(); call it on the scheduler's loop."""
+        self._stopped = True
+        self._changed.set()
+        if self._task and not self._sending:
+            self._task.cancel()
+
+    async def run(self):
+        """Sleeps until the next entry is due, runs it, and repeats until stop()."""
+        engine = self.engine
+        self._task = asyncio.current_task()
+        while not self._stopped:
+            next_run = self.schedule.next_run()
+            timeout = SCHEDULER_MAX_SLEEP if next_run is None else min(max(next_run - time.time(), 0), SCHEDULER_MAX_SLEEP)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopped:
+                break
+
+            now = time.time()
+            while not self._stopped:
+                entry = self.schedule.pop_due(now)
+                if entry is None:
+                    break
+                late = now - entry["next_run"]
+                if late > SCHEDULE_MISFIRE_GRACE:
+                    engine.log(f"⏭ Skipped a scheduled run that was due {late / 3600:.1f} hours ago.")
+                    continue
+                await self._run_entry(entry)
+
+    def _started(self):
+        # From here on stop() leaves the run to the engine's stop request.
+        self._sending = True
+
+    async def _run_entry(self, entry):
+        engine = self.engine
+        job = None
+        try:
+            error = check_attachments(entry["attachments"])
+            if error:
+                engine.log(f"❌ Scheduled run skipped: {error}")
+                return
+            group_index = GroupIndex(self.schedule.phone_number).load()
+            await get_groups_async(engine, group_index)
+            targets = group_index.targets(None if entry["targets"] is None else set(entry["targets"]))
+            if not targets:
+                engine.log("❌ Scheduled run skipped: none of its groups are left.")
+                return
+            job = SendJob.create(self.schedule.phone_number, entry["message"], entry["delay"], targets,
+                                 entry["attachments"], entry["parse_mode"], entry["variables"])
+            engine.log(f"\n--- Starting scheduled run (Delay: {entry['delay']}s) ---")
+            await send_message_to_groups(engine, job, on_start=self._started)
+        except asyncio.CancelledError:
+            if not self._sending:
+                # Stopped before its turn came: it runs on the next start instead.
+                if job is not None:
+                    job.delete()
+                self.schedule.put_back(entry)
+            raise
+        except Exception as e:
+            engine.log(f"❌ Scheduled run failed: {e}")
+        finally:
+            self._sending = False
@@ -0,0 +1,93 @@
+"""Searching, filtering and saving sets of target groups."""
+import re
+import time
+import unicodedata
+
+from .accounts import session_path
+from .jsonfile import load_json, save_json
+
+TARGET_SETS_SUFFIX = '.targets.json'
+
+def normalize_title(title):
+    """Case-folds a title and strips accents and repeated whitespace, for matching."""
+    decomposed = unicodedata.normalize("NFKD", title or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+class GroupSearchIndex:
+    """Precomputed, normalized view of GroupRecords for instant search.
+
+    Titles are normalized once when the index is built, so a keystroke only
+    costs a substring scan (and, for fuzzy matches, one compiled regex) over
+    plain strings.
+    """
+    def __init__(self, records):
+        self.records = list(records)
+        self.keys = [normalize_title(r.title) for r in self.records]
+
+    def search(self, query="", kind="all", min_members=None, active_within_days=None):
+        """Returns the positions of matching records, substring matches before fuzzy ones.
+
+        `kind` is "all", "supergroup" or "basic". Groups whose member count is
+        unknown are kept by the member filter.
+        """
+        candidates = range(len(self.records))
+        if kind != "all" or min_members or active_within_days:
+            since = time.time() - active_within_days * 86400 if active_within_days else None
+            candidates = [i for i in candidates if self._passes(self.records[i], kind, min_members, since)]
+
+        query = normalize_title(query)
+        if not query:
+            return list(candidates)
+
+        exact = []
+        fuzzy = []
+        # Fuzzy = the query's characters appear in order, e.g. "crpt" matches "crypto traders".
+        pattern = re.compile(".*?".join(re.escape(c) for c in query))
+        for i in candidates:
+            key = self.keys[i]
+            if query in key:
+                exact.append(i)
+            elif pattern.search(key):
+                fuzzy.append(i)
+        return exact + fuzzy
+
+    @staticmethod
+    def _passes(record, kind, min_members, since):
+        if kind == "supergroup" and record.type != "channel":
+            return False
+        if kind == "basic" and record.type != "chat":
+            return False
+        if min_members and record.members is not None and record.members < min_members:
+            return False
+        if since is not None and record.last_activity < since:
+            return False
+        return True
+
+class TargetSets:
+    """Named sets of peer ids per account, stored next to the session file."""
+    def __init__(self, phone_number):
+        self.path = f"{session_path(phone_number)}{TARGET_SETS_SUFFIX}"
+        self.sets = {}  # name -> list of marked peer ids
+
+    def load(self):
+        """Loads the sets from disk. A missing or corrupt file gives no sets."""
+        self.sets = load_json(self.path, {})
+        return self
+
+    def save(self):
+        save_json(self.path, self.sets)
+
+    def names(self):
+        return sorted(self.sets)
+
+    def get(self, name):
+        return set(self.sets.get(name, ()))
+
+    def put(self, name, peer_ids):
+        self.sets[name] = sorted(peer_ids)
+        self.save()
+
+    def delete(self, name):
+        if self.sets.pop(name, None) is not None:
+            self.save()
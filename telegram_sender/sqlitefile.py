@@ -0,0 +1,36 @@
+"""Stores kept in an SQLite database file, shared by threads and running app instances."""
+import sqlite3
+from contextlib import closing, contextmanager
+
+# How long a writer waits for another thread or app instance to release the database.
+SQLITE_BUSY_TIMEOUT = 5.0
+
+class SQLiteStore:
+    """Base for a store in one SQLite file, with its tables in `SCHEMA`.
+
+    Every call opens its own short-lived connection, so a store can be used
+    from any thread, and SQLite's locking keeps several running app instances
+    (GUI and CLI alike) from overwriting each other. The schema is created on
+    first use.
+    """
+    SCHEMA = ""
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Yields a connection inside a transaction that commits on success."""
+        with closing(sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT)) as db:
+            db.row_factory = sqlite3.Row
+            if not self._ready:
+                self._setup(db)
+                self._ready = True
+            with db:
+                yield db
+
+    def _setup(self, db):
+        # WAL lets readers in other instances carry on while one of them writes.
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(self.SCHEMA)
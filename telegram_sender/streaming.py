@@ -0,0 +1,339 @@
+"""Send runs fed from a file of chat ids or usernames, read as the run goes.
+
+A target file can hold millions of lines: it is read one line at a time from
+the job's byte offset, entities are resolved only when their turn comes (with a
+bounded LRU in front of get_input_entity), and progress is the offset reached.
+Memory use doesn't grow with the size of the file.
+"""
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+
+from telethon import utils
+from telethon.errors import FloodWaitError, SlowModeWaitError
+
+from .dedup import SentIndex, content_key
+from .media import MAX_CAPTION_LENGTH, MediaUploader, file_digest
+from . import pacing
+from .connection import CONNECTION_ERRORS
+from .templates import MAX_MESSAGE_LENGTH, MessageTemplate
+
+# Columns (CSV) or keys (NDJSON) that name the chat, in order of preference.
+TARGET_COLUMNS = ("peer_id", "chat_id", "chat", "username", "id")
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+ENTITY_CACHE_SIZE = 2048
+# A progress line is logged after this many targets.
+STREAM_PROGRESS_EVERY = 100
+USERNAME_PREFIX = re.compile(r"^(?:https?://)?(?:t\.me/|telegram\.me/)|^@", re.IGNORECASE)
+
+def parse_ref(value):
+    """Turns a chat id, @username or t.me link into what get_input_entity takes, or None if empty."""
+    if isinstance(value, int):
+        return value
+    value = str(value or "").strip()
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    value = USERNAME_PREFIX.sub("", value).strip("/")
+    return value.lower() or None
+
+class FileTarget:
+    """One line of a target file. `peer_id` is filled in once the entity is resolved."""
+    __slots__ = ("ref", "title", "end", "peer_id", "members")
+
+    def __init__(self, ref, title, end):
+        self.ref = ref
+        self.title = title or str(ref)
+        self.end = end  # byte offset just past this target's line
+        self.peer_id = ref if isinstance(ref, int) else None
+        self.members = None
+
+class TargetFile:
+    """Reads (ref, title) targets from a CSV or NDJSON file, tracking byte offsets.
+
+    A CSV file may start with a header naming one of TARGET_COLUMNS and an
+    optional "title" column; without one, the first column is the chat. NDJSON
+    lines are objects with the same keys, or bare ids and usernames. Lines
+    that name no chat are skipped.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.ndjson = path.lower().endswith(NDJSON_EXTENSIONS)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def read(self, offset=0):
+        """Yields FileTargets from byte `offset` on, one line at a time."""
+        with open(self.path, 'rb') as f:
+            ref_column, title_column = 0, None
+            if not self.ndjson:
+                header = self._csv_row(f.readline())
+                names = [name.strip().lower() for name in header]
+                known = [name for name in TARGET_COLUMNS if name in names]
+                if known:
+                    ref_column = names.index(known[0])
+                    title_column = names.index("title") if "title" in names else None
+                    offset = max(offset, f.tell())
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if self.ndjson:
+                    ref, title = self._ndjson_target(line)
+                else:
+                    row = self._csv_row(line)
+                    ref = parse_ref(row[ref_column]) if len(row) > ref_column else None
+                    title = row[title_column].strip() if title_column is not None and len(row) > title_column else None
+                if ref is not None:
+                    yield FileTarget(ref, title, offset)
+
+    @staticmethod
+    def _csv_row(line):
+        rows = list(csv.reader([line.decode('utf-8-sig', errors='replace')]))
+        return rows[0] if rows else []
+
+    @staticmethod
+    def _ndjson_target(line):
+        try:
+            data = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None, None
+        if not isinstance(data, dict):
+            return parse_ref(data), None
+        for key in TARGET_COLUMNS:
+            if data.get(key) not in (None, ""):
+                return parse_ref(data[key]), data.get("title")
+        return None, None
+
+class EntityResolver:
+    """get_input_entity with a bounded LRU in front of it.
+
+    Telethon already caches what it has seen in the session, but a username it
+    hasn't seen costs a ResolveUsername request, which Telegram rate-limits
+    hard. Recently resolved chats are kept here; the oldest are dropped
+    beyond `max_size`, so a huge run doesn't hold every entity it touched.
+    """
+    def __init__(self, client, max_size=ENTITY_CACHE_SIZE):
+        self.client = client
+        self.max_size = max_size
+        self._cache = OrderedDict()  # ref -> InputPeer
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, ref):
+        peer = self._cache.get(ref)
+        if peer is not None:
+            self._cache.move_to_end(ref)
+            self.hits += 1
+            return peer
+        self.misses += 1
+        peer = await self.client.get_input_entity(ref)
+        self._cache[ref] = peer
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return peer
+
+async def send_to_target_file(engine, job):
+    """Sends the StreamJob's message to every chat in its target file, from the journal's offset on.
+
+    Targets go out in file order, one at a time: a flood wait is waited out and
+    the same chat retried, as is a chat whose send was cut off by a lost
+    connection once it is back; a chat in slow mode is skipped. Each message is
+    checked against Telegram's limits just before it is sent, since the full
+    list is never in memory.
+    """
+    async with engine.running(job):
+        await _send_stream(engine, job)
+
+async def _send_stream(engine, job):
+    client = engine.client
+    run_started = time.time()
+    try:
+        template = MessageTemplate.for_job(job, now=run_started)
+    except (OSError, ValueError) as e:
+        job.close()
+        engine.log(f"❌ Error: Could not load the message template: {e}")
+        return
+    target_file = TargetFile(job.target_file)
+    try:
+        size = target_file.size
+    except OSError as e:
+        job.close()
+        engine.log(f"❌ Error: {e}")
+        return
+    max_length = MAX_CAPTION_LENGTH if job.attachments else MAX_MESSAGE_LENGTH
+
+    connection = engine.connection
+    if not await connection.ensure_connected():
+        job.close()
+        engine.log("\n--- Process stopped by user! ---")
+        return
+
+    digests = []
+    if job.attachments:
+        loop = asyncio.get_running_loop()
+        digests = await loop.run_in_executor(None, lambda: [file_digest(p) for p in job.attachments])
+    sent_index = SentIndex(job.phone_number, engine.dedup_window).load() if engine.dedup_window else None
+    resolver = EntityResolver(client)
+    metrics = engine.metrics
+    history = engine.history
+    delay = max(job.delay_seconds, pacing.MIN_SEND_INTERVAL)
+    stopped = False
+    done = 0
+    next_send_at = 0.0
+    if job.offset:
+        engine.log(f"📄 Continuing {os.path.basename(job.target_file)} at {_describe_progress(job.offset, size)}.")
+    metrics.start_run(job.path, 0)
+
+    flood_sleep_threshold = client.flood_sleep_threshold
+    client.flood_sleep_threshold = 0
+    try:
+        media = None
+        if job.attachments:
+            media = MediaUploader(client, job.phone_number, job.attachments, digests)
+            stopped = not await engine.unless_stopped(media.prepare())
+
+        for target in target_file.read(job.offset):
+            if stopped:
+                break
+            retries = 0
+            while True:
+                if (not await engine.wait_to_send(max(next_send_at - time.monotonic(), 0))
+                        or not await connection.ensure_connected()):
+                    stopped = True
+                    break
+                generation = connection.generation
+                status, flood_wait = await _send_target(engine, job, client, resolver, template, media,
+                                                        sent_index, digests, max_length, target)
+                if status == "disconnected":
+                    if not await connection.reconnect(generation):
+                        stopped = True
+                        break
+                    continue
+                if status == "flood_wait":
+                    next_send_at = time.monotonic() + flood_wait
+                    if retries < pacing.MAX_RATE_LIMIT_RETRIES:
+                        retries += 1
+                        engine.log(f"⏳ Flood wait of {flood_wait}s, {target.title} will be retried.")
+                        continue
+                    _mark(engine, job, target, "skipped", "flood wait")
+                    engine.log(f"❌ Skipped {target.title}: too many flood waits.")
+                elif status == "sent":
+                    next_send_at = time.monotonic() + delay
+                elif status == "failed":
+                    # A rejected request still counts against the account's rate.
+                    next_send_at = time.monotonic() + pacing.MIN_SEND_INTERVAL
+                break
+            if stopped:
+                break
+            done += 1
+            if done % STREAM_PROGRESS_EVERY == 0:
+                engine.log(f"📄 {done} targets done, {_describe_progress(target.end, size)}.")
+                engine.emit("progress", offset=target.end, size=size)
+        if not stopped:
+            job.finish()
+    finally:
+        client.flood_sleep_threshold = flood_sleep_threshold
+        job.close()
+        if sent_index:
+            sent_index.close()
+        history.flush()
+        metrics.end_run(stopped)
+
+    engine.emit("progress", offset=job.offset if stopped else size, size=size)
+    engine.log(f"📄 Entity cache: {resolver.hits} hits, {resolver.misses} lookups.")
+    if stopped:
+        engine.log(f"\n--- Process stopped by user at {_describe_progress(job.offset, size)}! ---")
+    else:
+        engine.log("\n--- All messages sent successfully! ---")
+
+async def _send_target(engine, job, client, resolver, template, media, sent_index, digests, max_length, target):
+    """Resolves and sends to one target, recording the outcome.
+
+    Returns ("sent" | "failed" | "skipped", None), or ("flood_wait", seconds) for
+    the caller to wait out and retry, or ("disconnected", None) for the caller to
+    retry once it has reconnected.
+    """
+    try:
+        entity = await resolver.resolve(target.ref)
+    except FloodWaitError as e:
+        engine.history.record(job.phone_number, job.path, target, "flood_wait", type(e).__name__, flood_wait=e.seconds)
+        engine.metrics.add_flood_wait(e.seconds)
+        return "flood_wait", e.seconds
+    except CONNECTION_ERRORS:
+        return "disconnected", None
+    except (ValueError, TypeError) as e:
+        _mark(engine, job, target, "failed", "not found")
+        engine.log(f"❌ Could not find {target.title}: {e}")
+        return "failed", None
+    target.peer_id = utils.get_peer_id(entity)
+
+    text, entities = template.render(target)
+    key = None
+    if sent_index:
+        key = content_key(template.source_for(target), job.parse_mode, digests)
+        if sent_index.seen(target.peer_id, key):
+            _mark(engine, job, target, "skipped", "duplicate")
+            return "skipped", None
+    error = template.check([target], max_length, allow_empty=bool(media))
+    if error:
+        _mark(engine, job, target, "skipped", "invalid message")
+        engine.log(f"❌ Skipped {target.title}: {error}")
+        return "skipped", None
+
+    metrics = engine.metrics
+    sent_at = time.perf_counter()
+    try:
+        if media:
+            await media.send(entity, text, template.telethon_parse_mode, entities)
+        else:
+            await client.send_message(entity, text, parse_mode=template.telethon_parse_mode, formatting_entities=entities)
+    except FloodWaitError as e:
+        latency = time.perf_counter() - sent_at
+        metrics.observe_send(latency, target.title, type(e).__name__)
+        metrics.add_flood_wait(e.seconds)
+        engine.history.record(job.phone_number, job.path, target, "flood_wait", type(e).__name__, latency, e.seconds)
+        return "flood_wait", e.seconds
+    except SlowModeWaitError as e:
+        # Waiting would hold up the whole file for one chat.
+        latency = time.perf_counter() - sent_at
+        metrics.observe_send(latency, target.title, type(e).__name__)
+        engine.history.record(job.phone_number, job.path, target, "slow_mode", type(e).__name__, latency)
+        _mark(engine, job, target, "skipped", "slow mode")
+        engine.log(f"❌ Skipped {target.title}: slow mode for another {e.seconds}s.")
+        return "failed", None
+    except CONNECTION_ERRORS as e:
+        metrics.observe_send(time.perf_counter() - sent_at, target.title, type(e).__name__)
+        engine.log(f"🔌 Lost the connection while sending to {target.title}, it will be retried.")
+        return "disconnected", None
+    except Exception as e:
+        latency = time.perf_counter() - sent_at
+        metrics.observe_send(latency, target.title, type(e).__name__)
+        _mark(engine, job, target, "failed", type(e).__name__, latency, str(e))
+        engine.log(f"❌ Error sending to {target.title}: {e}")
+        return "failed", None
+    latency = time.perf_counter() - sent_at
+    metrics.observe_send(latency, target.title)
+    _mark(engine, job, target, "sent", latency=latency)
+    if sent_index:
+        sent_index.record(target.peer_id, key)
+    engine.log(f"✅ Sent to: {target.title}")
+    engine.emit("sent", title=target.title)
+    return "sent", None
+
+def _mark(engine, job, target, status, error=None, latency=None, detail=None):
+    """Records a final outcome in the job journal and the run history."""
+    job.mark(target.end, status, detail or error)
+    engine.history.record(job.phone_number, job.path, target, status, error, latency)
+
+def _describe_progress(offset, size):
+    return f"{_format_size(offset)} of {_format_size(size)} ({offset / size if size else 1:.0%})"
+
+def _format_size(size):
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
@@ -0,0 +1,216 @@
+"""Per-target message templates.
+
+A message may contain placeholders such as {{title}} or {{greeting}}, plus any
+column of a variables CSV. Templates are compiled once per run and checked
+against every target before the first message goes out, so a message Telegram
+would reject never costs an API call.
+"""
+import copy
+import csv
+import html
+import re
+import time
+
+from telethon.extensions import html as html_parser
+from telethon.extensions import markdown as markdown_parser
+
+from .media import MAX_CAPTION_LENGTH
+from .selection import normalize_title
+
+# Telegram limits on one message.
+MAX_MESSAGE_LENGTH = 4096
+MAX_ENTITIES = 100
+
+# Parse mode names -> what Telethon's send_message/send_file expect. Telethon itself defaults to Markdown.
+PARSE_MODES = {"markdown": "md", "html": "html", "plain": None}
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+# Stands in for the n-th placeholder while the markup is parsed; private-use characters no markup gives meaning to.
+PLACEHOLDER_MARK = "\ue000{}\ue001"
+MARK = re.compile("\ue000(\\d+)\ue001")
+DEFAULT_LANGUAGE = "en"
+# Morning, afternoon and evening greetings; a "lang" column in the variables CSV picks one per chat.
+GREETINGS = {
+    "en": ("Good morning", "Good afternoon", "Good evening"),
+    "si": ("සුභ උදෑසනක්", "සුභ දහවලක්", "සුභ සන්ධ්‍යාවක්"),
+    "ta": ("காலை வணக்கம்", "மதிய வணக்கம்", "மாலை வணக்கம்"),
+}
+DATE_FORMAT = "%Y-%m-%d"
+
+def message_length(text):
+    """Length as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+def greeting_for(language, hour):
+    greetings = GREETINGS.get(language) or GREETINGS[DEFAULT_LANGUAGE]
+    if hour < 12:
+        return greetings[0]
+    return greetings[1] if hour < 18 else greetings[2]
+
+def load_variables(path):
+    """Reads a variables CSV into {key: row}.
+
+    Rows are matched to chats by a "peer_id" column, or else by a "title" column
+    (compared like the group picker's search). Every other column becomes a placeholder.
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {"peer_id", "title"} & set(reader.fieldnames):
+            raise ValueError("The variables file needs a 'peer_id' or 'title' column.")
+        rows = {}
+        for row in reader:
+            if row.get("peer_id"):
+                rows[row["peer_id"].strip()] = row
+            if row.get("title"):
+                rows[normalize_title(row["title"])] = row
+    return rows
+
+class MessageTemplate:
+    """A message compiled into literal and placeholder parts.
+
+    The markup is parsed once, with a marker standing in for every placeholder.
+    Rendering a target joins the plain text around its values and shifts the
+    formatting entities by the values' lengths, so a value is always sent as
+    written: a "*" or "<" in a group title or a CSV cell never turns into
+    formatting, in any parse mode. A message without placeholders is left to
+    Telethon's own parser, as before.
+    """
+    def __init__(self, source, parse_mode="markdown", variables=None, now=None):
+        if parse_mode not in PARSE_MODES:
+            raise ValueError(f"Unknown parse mode '{parse_mode}'.")
+        self.source = source
+        self.parse_mode = parse_mode
+        self.variables = variables or {}
+        # Date and greeting are fixed when the run starts, so every message is validated as sent.
+        self.now = time.localtime(now)
+        self.parts = PLACEHOLDER.split(source)  # literal, field, literal, field, ...
+        self.fields = set(self.parts[1::2])
+        self.telethon_parse_mode = PARSE_MODES[parse_mode]
+        self._compile()
+
+    @classmethod
+    def for_job(cls, job, now=None):
+        variables = load_variables(job.variables_file) if job.variables_file else None
+        return cls(job.message, job.parse_mode, variables, now)
+
+    def _compile(self):
+        marked = "".join(part if i % 2 == 0 else PLACEHOLDER_MARK.format(i // 2) for i, part in enumerate(self.parts))
+        self.text, self.entities = self._parse(marked)
+        # Plain text split at the markers: literal, placeholder number, literal, ...
+        self._pieces = MARK.split(self.text)
+        # (UTF-16 offset, length) of every marker in the parsed text, which entity offsets count in.
+        self._marks = []
+        offset = 0
+        for i, piece in enumerate(self._pieces):
+            length = len(piece) + 2 if i % 2 else message_length(piece)
+            if i % 2:
+                self._marks.append((offset, length))
+            offset += length
+
+    def render(self, record):
+        """Returns (text, entities) for one GroupRecord.
+
+        `entities` is None for a message without placeholders: the text is then
+        still in the template's markup, for Telethon to parse when sending.
+        """
+        if not self.fields:
+            return self.source, None
+        values = self._values(record)
+        names = self.parts[1::2]
+        pieces = self._pieces[:]
+        shifts = []
+        for i in range(1, len(pieces), 2):
+            pieces[i] = values[names[int(pieces[i])]]
+            shifts.append(message_length(pieces[i]))
+        entities = []
+        for entity in self.entities:
+            start = end = 0
+            for (offset, length), value_length in zip(self._marks, shifts):
+                if offset < entity.offset:
+                    start += value_length - length
+                if offset < entity.offset + entity.length:
+                    end += value_length - length
+            if entity.length + end - start <= 0:
+                continue  # only held placeholders that came out empty
+            entity = copy.copy(entity)
+            entity.offset += start
+            entity.length += end - start
+            if getattr(entity, "url", None):
+                # A placeholder in a link target, e.g. [site](https://t.me/{{username}})
+                entity.url = MARK.sub(lambda m: values[names[int(m.group(1))]], entity.url)
+            entities.append(entity)
+        return "".join(pieces), entities
+
+    def source_for(self, record):
+        """The template with the record's values filled in, as markup; identifies the message for the duplicate guard."""
+        if not self.fields:
+            return self.source
+        values = self._values(record)
+        escape = html.escape if self.parse_mode == "html" else str
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = escape(values[parts[i]])
+        return "".join(parts)
+
+    def check(self, targets, max_length=MAX_MESSAGE_LENGTH, allow_empty=False):
+        """Returns an error message for the first target Telegram would reject, or None.
+
+        A message without placeholders is the same for every target and is
+        checked once, even with no targets. Otherwise every target is rendered;
+        with no targets only the literal text is checked, as a lower bound.
+        """
+        if not self.fields:
+            return self._check_text(self.text, self.entities, "The message", max_length, allow_empty)
+        if not targets:
+            return self._check_text("".join(self._pieces[::2]), [], "The message", max_length, allow_empty=True)
+        try:
+            for record in targets:
+                text, entities = self.render(record)
+                error = self._check_text(text, entities, f"The message for {record.title}", max_length, allow_empty)
+                if error:
+                    return error
+        except KeyError as e:
+            return f"No value for {{{{{e.args[0]}}}}} in {record.title}."
+        return None
+
+    @staticmethod
+    def _check_text(text, entities, label, max_length, allow_empty):
+        if not allow_empty and not text.strip():
+            return f"{label} is empty."
+        if message_length(text) > max_length:
+            return f"{label} is {message_length(text)} characters; Telegram allows {max_length}."
+        if len(entities) > MAX_ENTITIES:
+            return f"{label} has {len(entities)} formatting entities; Telegram allows {MAX_ENTITIES}."
+        return None
+
+    def _values(self, record):
+        row = self.variables.get(str(record.peer_id)) or self.variables.get(normalize_title(record.title)) or {}
+        values = {name: value for name, value in row.items() if name in self.fields and value is not None}
+        values.update(
+            title=record.title,
+            members="" if record.members is None else str(record.members),
+            greeting=greeting_for(row.get("lang") or DEFAULT_LANGUAGE, self.now.tm_hour),
+            date=time.strftime(DATE_FORMAT, self.now),
+        )
+        return values
+
+    def _parse(self, text):
+        if self.parse_mode == "markdown":
+            text, entities = markdown_parser.parse(text)
+        elif self.parse_mode == "html":
+            text, entities = html_parser.parse(text)
+        else:
+            return text, []
+        # Telethon drops empty entities before sending; don't count them against the limit.
+        return text, [e for e in entities if e.length]
+
+def check_template(message, parse_mode, variables_file, targets, attachments=(), now=None):
+    """Returns an error message if the message can't be rendered and sent to every target, otherwise None."""
+    try:
+        variables = load_variables(variables_file) if variables_file else None
+        template = MessageTemplate(message, parse_mode, variables, now)
+    except (OSError, ValueError) as e:
+        return f"Could not load the message template: {e}"
+    # Media captions are shorter than text messages, and may be left out.
+    if attachments:
+        return template.check(targets, MAX_CAPTION_LENGTH, allow_empty=True)
+    return template.check(targets)
@@ -0,0 +1,36 @@
+import sqlite3
+
+from telegram_sender.accounts import AccountStore, delete_account_files, session_path
+from telegram_sender.groups import GroupRecord
+from telegram_sender.history import RunHistory
+
+def test_delete_account_files_removes_the_session_and_its_sidecars(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    names = [f"{session_path('+123')}{suffix}" for suffix in
+             (".session", ".session-journal", ".groups.json", ".sent.log", ".schedule.json", ".uploads.json.tmp")]
+    kept = [f"{session_path('+1234')}.session", "accounts.db"]
+    for name in names + kept:
+        (tmp_path / name).write_text("x")
+    delete_account_files("+123")
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(kept)
+
+def test_account_store_imports_the_legacy_file_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "accounts.json").write_text('{"+1": {"api_id": 1, "api_hash": "h"}}')
+    store = AccountStore()
+    assert store.add("+2", 2, "h2")
+    assert not store.add("+2", 2, "h2")
+    store.update("+2", group_count=5)
+    assert list(store.all()) == ["+1", "+2"]
+    assert store.get("+2")["group_count"] == 5
+    assert not (tmp_path / "accounts.json").exists()
+    # Another instance sees the same accounts.
+    assert list(AccountStore().all()) == ["+1", "+2"]
+
+def test_run_history_shares_the_store_setup(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"))
+    history.record("+1", "job", GroupRecord(-1001, 1, 2, "channel", "A"), "sent", latency=0.5)
+    history.record("+1", "job", GroupRecord(-1001, 1, 2, "channel", "A"), "failed", "ChatWriteForbiddenError")
+    assert history.totals("+1") == {"sent": 1, "failed": 1, "flood_wait_seconds": 0}
+    with sqlite3.connect(history.path) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
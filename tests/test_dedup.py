@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from telegram_sender import dedup
+from telegram_sender.dedup import SentIndex, content_key
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+def test_content_key_covers_text_parse_mode_and_attachments():
+    key = content_key("Hi", "markdown")
+    assert key == content_key("Hi", "markdown")
+    assert key != content_key("Hi", "html")
+    assert key != content_key("Hi!", "markdown")
+    assert key != content_key("Hi", "markdown", ["ab" * 32])
+
+def test_recorded_sends_are_seen_after_a_reload():
+    index = SentIndex("1").load()
+    index.record(-1001, "k1")
+    index.close()
+    loaded = SentIndex("1").load()
+    assert loaded.seen(-1001, "k1")
+    assert not loaded.seen(-1001, "k2")
+    assert not loaded.seen(-1002, "k1")
+
+def test_expired_lines_are_not_loaded():
+    index = SentIndex("1", window=60)
+    with open(index.path, 'w', encoding='ascii') as f:
+        f.write(f"-1001 k1 {int(time.time()) - 120}\n-1002 k1 {int(time.time())}\n")
+    index.load()
+    assert list(index.sent) == [(-1002, "k1")]
+
+def test_damaged_lines_are_skipped():
+    index = SentIndex("1")
+    now = int(time.time())
+    with open(index.path, 'w', encoding='ascii') as f:
+        f.write(f"-1001-1002 k1 {now}\nnot a line\n-1003 k1 {now}\n")
+    assert list(index.load().sent) == [(-1003, "k1")]
+
+def test_append_after_a_cut_line_starts_a_new_line():
+    index = SentIndex("1")
+    with open(index.path, 'w', encoding='ascii') as f:
+        f.write(f"-1001 k1 {int(time.time())}\n-1001")
+    index.load()
+    index.record(-1002, "k2")
+    index.close()
+    loaded = SentIndex("1").load()
+    assert loaded.seen(-1001, "k1")
+    assert loaded.seen(-1002, "k2")
+
+def test_compaction_drops_expired_lines(monkeypatch):
+    monkeypatch.setattr(dedup, "SENT_INDEX_COMPACT_MIN_LINES", 4)
+    index = SentIndex("1", window=60)
+    old = int(time.time()) - 120
+    with open(index.path, 'w', encoding='ascii') as f:
+        for peer_id in range(5):
+            f.write(f"{peer_id} k {old}\n")
+        f.write(f"9 k {int(time.time())}")  # cut short, but complete enough to parse
+    index.load()
+    index.record(10, "k")
+    index.close()
+    with open(index.path, encoding='ascii') as f:
+        assert [line.split()[0] for line in f] == ["9", "10"]
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from telegram_sender.groups import GroupRecord
+from telegram_sender.jobs import SendJob, StreamJob
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+def groups(count):
+    return [GroupRecord(-1000000000000 - i, i, i * 7, "channel", f"Group {i}") for i in range(count)]
+
+def test_replay_restores_outcomes_and_settings():
+    job = SendJob.create("1", "Hi {{title}}", 30, groups(3), parse_mode="html")
+    job.mark(0, "sent")
+    job.mark(2, "failed", "ChatWriteForbiddenError")
+    job.close()
+    loaded = SendJob.load(job.path)
+    assert loaded.message == "Hi {{title}}"
+    assert loaded.parse_mode == "html"
+    assert loaded.delay_seconds == 30
+    assert [t.title for t in loaded.targets] == ["Group 0", "Group 1", "Group 2"]
+    assert loaded.status == {0: "sent", 2: "failed"}
+    assert [i for i, _ in loaded.pending_targets()] == [1]
+    assert not loaded.finished
+
+def test_line_cut_short_by_a_crash_is_ignored():
+    job = SendJob.create("1", "Hi", 1, groups(3))
+    job.mark(0, "sent")
+    job.close()
+    with open(job.path, 'a', encoding='utf-8') as f:
+        f.write('{"t": 1, "s": "se')
+    loaded = SendJob.load(job.path)
+    assert loaded.status == {0: "sent"}
+    assert [i for i, _ in loaded.pending_targets()] == [1, 2]
+
+def test_resumed_run_does_not_lose_its_first_outcome_after_a_cut_line():
+    job = SendJob.create("1", "Hi", 1, groups(3))
+    job.close()
+    with open(job.path, 'a', encoding='utf-8') as f:
+        f.write('{"t": 0, "s": "se')
+    resumed = SendJob.load(job.path)
+    resumed.mark(1, "sent")
+    resumed.close()
+    assert SendJob.load(job.path).status == {1: "sent"}
+
+def test_finished_job_is_not_resumed():
+    job = SendJob.create("1", "Hi", 1, groups(2))
+    job.mark(0, "sent")
+    job.finish()
+    assert SendJob.load(job.path).finished
+    assert SendJob.latest_unfinished("1") is None
+
+def test_latest_unfinished_skips_other_accounts_and_complete_jobs():
+    older = SendJob.create("1", "older", 1, groups(2))
+    older.close()
+    newer = SendJob.create("1", "newer", 1, groups(1))
+    newer.mark(0, "sent")
+    newer.close()
+    SendJob.create("2", "other account", 1, groups(2)).close()
+    assert SendJob.latest_unfinished("1").message == "older"
+
+def test_jobs_created_in_the_same_second_get_their_own_journal():
+    first = SendJob.create("1", "first", 1, groups(3))
+    first.mark(0, "sent")
+    first.close()
+    second = SendJob.create("1", "second", 1, groups(2))
+    second.close()
+    assert first.path != second.path
+    assert SendJob.load(first.path).status == {0: "sent"}
+    assert SendJob.load(second.path).status == {}
+    assert SendJob.latest_unfinished("1").message == "second"
+
+def test_stream_job_resumes_from_the_last_offset(tmp_path):
+    job = StreamJob.create("1", "Hi", 1, "targets.csv")
+    for offset in (10, 20, 35):
+        job.mark(offset, "sent")
+    job.close()
+    loaded = StreamJob.latest_unfinished("1")
+    assert loaded.offset == 35
+    assert loaded.target_file == str(tmp_path / "targets.csv")
+    assert SendJob.latest_unfinished("1") is None  # stream journals aren't replayed as send jobs
+
+def test_stream_job_reads_only_the_tail_of_a_long_journal():
+    job = StreamJob.create("1", "Hi", 1, "targets.csv")
+    for offset in range(1, 5001):
+        job.mark(offset * 10, "sent", "x" * 20)
+    job.close()
+    with open(job.path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"o": 50010, "s": "sent"})[:8])
+    assert StreamJob.load(job.path).offset == 50000
+
+def test_finished_stream_job_is_not_resumed():
+    job = StreamJob.create("1", "Hi", 1, "targets.csv")
+    job.mark(10, "sent")
+    job.finish()
+    assert StreamJob.load(job.path).finished
+    assert StreamJob.latest_unfinished("1") is None
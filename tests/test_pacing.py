@@ -0,0 +1,76 @@
+import time
+
+from telegram_sender.pacing import MAX_RATE_LIMIT_RETRIES, MIN_SEND_INTERVAL, SendPacer
+
+def drain(pacer):
+    """Pops every target, ignoring waits."""
+    order = []
+    while pacer:
+        order.append(pacer.next_target()[1])
+    return order
+
+def test_targets_go_out_in_order():
+    assert drain(SendPacer(["a", "b", "c"], 5)) == ["a", "b", "c"]
+
+def test_delay_is_applied_after_a_send():
+    pacer = SendPacer(["a", "b"], 5)
+    wait, _ = pacer.next_target()
+    assert wait == 0
+    pacer.sent()
+    wait, target = pacer.next_target()
+    assert target == "b"
+    assert 4.9 < wait <= 5
+
+def test_delay_never_drops_below_the_minimum_interval():
+    assert SendPacer(["a"], 0).delay_seconds == MIN_SEND_INTERVAL
+
+def test_flood_wait_blocks_every_target():
+    pacer = SendPacer(["a", "b"], 1)
+    _, target = pacer.next_target()
+    assert pacer.flood_wait(target, 30)
+    wait, target = pacer.next_target()
+    assert target == "b"
+    assert wait > 29
+
+def test_slow_mode_only_pushes_back_that_chat():
+    pacer = SendPacer(["a", "b", "c"], 1)
+    _, target = pacer.next_target()
+    assert pacer.slow_mode(target, 30)
+    wait, target = pacer.next_target()
+    assert target == "b"
+    assert wait <= MIN_SEND_INTERVAL
+    assert drain(pacer) == ["c", "a"]
+
+def test_requeued_target_gives_up_after_the_retry_limit():
+    pacer = SendPacer(["a"], 1)
+    for _ in range(MAX_RATE_LIMIT_RETRIES):
+        _, target = pacer.next_target()
+        assert pacer.slow_mode(target, 0)
+    _, target = pacer.next_target()
+    assert not pacer.slow_mode(target, 0)
+    assert not pacer
+
+def test_retries_are_counted_per_target():
+    pacer = SendPacer(["a", "b"], 1)
+    retries = {"a": 0, "b": 0}
+    while pacer:
+        _, target = pacer.next_target()
+        if pacer.slow_mode(target, 0):
+            retries[target] += 1
+    assert retries == {"a": MAX_RATE_LIMIT_RETRIES, "b": MAX_RATE_LIMIT_RETRIES}
+
+def test_put_back_returns_the_target_to_the_front_without_a_retry():
+    pacer = SendPacer(["a", "b"], 1)
+    for _ in range(MAX_RATE_LIMIT_RETRIES + 2):
+        _, target = pacer.next_target()
+        assert target == "a"
+        pacer.put_back(target)
+    assert drain(pacer) == ["a", "b"]
+
+def test_not_before_holds_a_target_while_others_go_first():
+    pacer = SendPacer(["a", "b"], 1, {0: time.time() + 60})
+    _, target = pacer.next_target()
+    assert target == "b"
+    wait, target = pacer.next_target()
+    assert target == "a"
+    assert 59 < wait <= 60
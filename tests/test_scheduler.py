@@ -0,0 +1,121 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from benchmarks.fake_client import FakeTelegramClient
+from telegram_sender.engine import SenderEngine
+from telegram_sender.jobs import SendJob
+from telegram_sender.scheduler import CronSchedule, Schedule, Scheduler
+
+def next_after(expression, *start):
+    return datetime.fromtimestamp(CronSchedule(expression).next_after(datetime(*start).timestamp()))
+
+def test_next_minute_is_strictly_after():
+    assert next_after("* * * * *", 2026, 10, 17, 10, 0, 30) == datetime(2026, 10, 17, 10, 1)
+    assert next_after("* * * * *", 2026, 10, 17, 10, 0) == datetime(2026, 10, 17, 10, 1)
+
+def test_weekday_range_skips_the_weekend():
+    # 2026-10-16 is a Friday.
+    assert next_after("30 9 * * 1-5", 2026, 10, 16, 10, 0) == datetime(2026, 10, 19, 9, 30)
+
+def test_steps_and_lists():
+    assert next_after("*/15 * * * *", 2026, 10, 17, 10, 16) == datetime(2026, 10, 17, 10, 30)
+    assert next_after("0 9,17 * * *", 2026, 10, 17, 9, 0) == datetime(2026, 10, 17, 17, 0)
+
+def test_day_of_month_and_weekday_match_either_way_when_both_are_restricted():
+    # The 13th, or any Friday: Friday the 23rd comes before November 13th.
+    assert next_after("0 8 13 * 5", 2026, 10, 17) == datetime(2026, 10, 23, 8, 0)
+    # Tuesday the 13th comes before the next Friday.
+    assert next_after("0 8 13 * 5", 2026, 10, 10) == datetime(2026, 10, 13, 8, 0)
+
+def test_unrestricted_weekday_means_only_the_day_of_month():
+    assert next_after("0 0 13 * *", 2026, 10, 14) == datetime(2026, 11, 13)
+
+def test_sunday_is_0_or_7():
+    assert next_after("5 4 * * 7", 2026, 10, 17) == next_after("5 4 * * 0", 2026, 10, 17) == datetime(2026, 10, 18, 4, 5)
+
+def test_month_and_year_rollover():
+    assert next_after("0 12 1 * *", 2026, 10, 17) == datetime(2026, 11, 1, 12, 0)
+    assert next_after("0 0 1 1 *", 2026, 12, 15) == datetime(2027, 1, 1)
+    assert next_after("0 0 31 * *", 2026, 11, 1) == datetime(2026, 12, 31)
+
+def test_leap_day():
+    assert next_after("0 0 29 2 *", 2026, 10, 17) == datetime(2028, 2, 29)
+
+def test_aliases():
+    assert next_after("@daily", 2026, 10, 17, 10, 0) == datetime(2026, 10, 18)
+    assert next_after("@monthly", 2026, 12, 2) == datetime(2027, 1, 1)
+
+@pytest.mark.parametrize("expression", ["* * *", "61 * * * *", "a * * * *", "5-1 * * * *", "*/0 * * * *"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+def test_expression_that_never_matches():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(datetime(2026, 10, 17).timestamp())
+
+@pytest.fixture
+def schedule(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return Schedule("test").load()
+
+def test_due_entries_are_popped_one_at_a_time(schedule):
+    now = time.time()
+    for i in range(3):
+        schedule.add(f"message {i}", 60, run_at=now + 60 + i)
+    later = now + 120
+    entry = schedule.pop_due(later)
+    assert entry["message"] == "message 0"
+    # What the caller didn't get to stays scheduled, on disk too.
+    assert sorted(e["message"] for e in Schedule("test").load().entries.values()) == ["message 1", "message 2"]
+    assert schedule.pop_due(later)["message"] == "message 1"
+    assert schedule.pop_due(later)["message"] == "message 2"
+    assert schedule.pop_due(later) is None
+
+def test_recurring_entry_moves_to_its_next_occurrence(schedule):
+    start = datetime(2026, 10, 17, 8, 0).timestamp()
+    entry = schedule.add("daily", 60, run_at=start, cron="0 9 * * *")
+    assert datetime.fromtimestamp(entry["next_run"]) == datetime(2026, 10, 17, 9, 0)
+    # Several missed occurrences collapse into one run.
+    late = datetime(2026, 10, 19, 12, 0).timestamp()
+    assert schedule.pop_due(late)["id"] == entry["id"]
+    assert schedule.pop_due(late) is None
+    assert datetime.fromtimestamp(schedule.next_run()) == datetime(2026, 10, 20, 9, 0)
+
+def test_put_back_restores_an_entry_that_did_not_run(schedule):
+    now = time.time()
+    schedule.add("once", 60, run_at=now + 60)
+    entry = schedule.pop_due(now + 120)
+    assert not schedule.entries
+    schedule.put_back(entry)
+    assert Schedule("test").load().entries[entry["id"]]["next_run"] == now + 60
+    assert schedule.pop_due(now + 120)["id"] == entry["id"]
+
+def test_stop_cancels_a_scheduled_run_still_waiting_for_its_turn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeTelegramClient(groups=3)
+    engine = SenderEngine()
+    engine.client = client
+    engine.phone_number = "test"
+    Schedule("test").load().add("scheduled", 0, run_at=time.time() + 0.05)
+
+    async def run():
+        scheduler = Scheduler(engine, "test")
+        await engine.send_lock.acquire()  # a manual run
+        task = asyncio.create_task(scheduler.run())
+        while scheduler.schedule.entries:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # synced groups, now waiting for the lock
+        scheduler.stop()
+        engine.request_stop()
+        engine.send_lock.release()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert client.send_latencies == []  # nothing was sent
+    assert [e["message"] for e in Schedule("test").load().entries.values()] == ["scheduled"]
+    assert SendJob.latest_unfinished("test") is None
@@ -0,0 +1,75 @@
+import asyncio
+
+from telegram_sender.streaming import EntityResolver, TargetFile, parse_ref
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+def test_parse_ref():
+    assert parse_ref("-1001234567890") == -1001234567890
+    assert parse_ref(" 42 ") == 42
+    assert parse_ref(7) == 7
+    assert parse_ref("@SomeChannel") == "somechannel"
+    assert parse_ref("https://t.me/SomeChannel/") == "somechannel"
+    assert parse_ref("t.me/some_group") == "some_group"
+    assert parse_ref("") is None
+    assert parse_ref(None) is None
+
+def test_csv_with_header_uses_named_columns(tmp_path):
+    path = write(tmp_path, "targets.csv", "title,username\nFirst,@one\nNo chat,\n\"Second, Inc\",t.me/two\n")
+    targets = list(TargetFile(path).read())
+    assert [(t.ref, t.title) for t in targets] == [("one", "First"), ("two", "Second, Inc")]
+
+def test_csv_without_header_reads_the_first_line_as_a_target(tmp_path):
+    path = write(tmp_path, "targets.csv", "-1001,ignored\n@two\n")
+    targets = list(TargetFile(path).read())
+    assert [t.ref for t in targets] == [-1001, "two"]
+    assert targets[0].peer_id == -1001 and targets[1].peer_id is None
+    assert targets[0].title == "-1001"
+
+def test_ndjson_objects_and_bare_values(tmp_path):
+    path = write(tmp_path, "targets.ndjson", '{"chat_id": -1001, "title": "A"}\n"@b"\nnot json\n{"other": 1}\n42\n')
+    targets = list(TargetFile(path).read())
+    assert [(t.ref, t.title) for t in targets] == [(-1001, "A"), ("b", "b"), (42, "42")]
+
+def test_offsets_are_bytes_past_each_line(tmp_path):
+    text = "username,title\n@a,Ünïcode\n@b,B\n"
+    path = write(tmp_path, "targets.csv", text)
+    targets = list(TargetFile(path).read())
+    data = text.encode("utf-8")
+    assert targets[0].end == data.index(b"@b")
+    assert targets[1].end == len(data) == TargetFile(path).size
+
+def test_resume_from_a_targets_end(tmp_path):
+    for name, text in (("with_header.csv", "peer_id\n1\n2\n3\n4\n"),
+                       ("no_header.csv", "1\n2\n3\n4\n"),
+                       ("targets.jsonl", "1\n2\n3\n4\n")):
+        path = write(tmp_path, name, text)
+        first = list(TargetFile(path).read())
+        rest = list(TargetFile(path).read(first[1].end))
+        assert [t.ref for t in rest] == [3, 4], name
+        assert [t.end for t in rest] == [t.end for t in first[2:]], name
+
+def test_resume_at_offset_zero_still_skips_the_header(tmp_path):
+    path = write(tmp_path, "targets.csv", "\ufeffpeer_id,title\n1,One\n")
+    assert [(t.ref, t.title) for t in TargetFile(path).read(0)] == [(1, "One")]
+
+def test_entity_resolver_drops_the_least_recently_used():
+    class Client:
+        calls = []
+        async def get_input_entity(self, ref):
+            self.calls.append(ref)
+            return f"peer:{ref}"
+
+    async def run():
+        client = Client()
+        resolver = EntityResolver(client, max_size=2)
+        for ref in ("a", "b", "a", "c", "a", "b"):
+            assert await resolver.resolve(ref) == f"peer:{ref}"
+        return client.calls, resolver
+
+    calls, resolver = asyncio.run(run())
+    assert calls == ["a", "b", "c", "b"]
+    assert (resolver.hits, resolver.misses) == (2, 4)
@@ -0,0 +1,82 @@
+import pytest
+
+from telegram_sender.groups import GroupRecord
+from telegram_sender.templates import MAX_MESSAGE_LENGTH, MessageTemplate, check_template, message_length
+
+def group(title="Group", members=None, peer_id=-1001):
+    return GroupRecord(peer_id, 1, 2, "channel", title, members)
+
+def spans(text, entities):
+    """(entity type, covered text) for each entity; offsets count UTF-16 code units."""
+    data = text.encode("utf-16-le")
+    return [(type(e).__name__, data[2 * e.offset:2 * (e.offset + e.length)].decode("utf-16-le")) for e in entities]
+
+def render(source, record, parse_mode="markdown"):
+    text, entities = MessageTemplate(source, parse_mode).render(record)
+    return text, spans(text, entities)
+
+def test_static_message_is_left_to_telethon():
+    assert MessageTemplate("**Hi**", "markdown").render(group()) == ("**Hi**", None)
+
+def test_value_is_sent_as_written():
+    text, entities = render("Hi {{title}}!", group("*not bold* <b>"))
+    assert text == "Hi *not bold* <b>!"
+    assert entities == []
+
+@pytest.mark.parametrize("source, covered", [
+    ("**{{title}} rocks** today", "Team rocks"),
+    ("**welcome {{title}}** today", "welcome Team"),
+    ("**{{title}}** today", "Team"),
+])
+def test_placeholder_at_the_start_or_end_of_an_entity(source, covered):
+    text, entities = render(source, group("Team"))
+    assert entities == [("MessageEntityBold", covered)]
+
+def test_entities_after_a_value_are_shifted():
+    text, entities = render("{{title}} is **bold** and __italic__", group("A long title"))
+    assert text == "A long title is bold and italic"
+    assert entities == [("MessageEntityBold", "bold"), ("MessageEntityItalic", "italic")]
+
+def test_entity_covering_only_an_empty_value_is_dropped():
+    text, entities = render("**{{members}}** members, **total**", group(members=None))
+    assert text == " members, total"
+    assert entities == [("MessageEntityBold", "total")]
+
+def test_astral_plane_characters_count_as_two_units():
+    text, entities = render("{{title}} **ok** <b>{{title}}</b>", group("😀𝔸b"), "markdown")
+    assert entities == [("MessageEntityBold", "ok")]
+    text, entities = render("<b>{{title}}</b> <i>after</i>", group("😀𝔸b"), "html")
+    assert text == "😀𝔸b after"
+    assert entities == [("MessageEntityBold", "😀𝔸b"), ("MessageEntityItalic", "after")]
+    assert message_length(text) == len(text) + 2
+
+def test_placeholder_in_a_link_url():
+    text, entities = MessageTemplate("Join [{{title}}](https://t.me/{{title}})", "markdown").render(group("news"))
+    assert text == "Join news"
+    assert spans(text, entities) == [("MessageEntityTextUrl", "news")]
+    assert entities[0].url == "https://t.me/news"
+    text, entities = MessageTemplate('<a href="https://t.me/{{title}}">link</a>', "html").render(group("news"))
+    assert entities[0].url == "https://t.me/news"
+
+def test_variables_are_matched_by_peer_id_or_title():
+    variables = {"-1001": {"peer_id": "-1001", "city": "Kandy"}, "other": {"title": "Other", "city": "Galle"}}
+    template = MessageTemplate("{{city}}", "plain", variables)
+    assert template.render(group())[0] == "Kandy"
+    assert template.render(group("Other", peer_id=-1002))[0] == "Galle"
+
+def test_unknown_field_is_reported_before_sending():
+    template = MessageTemplate("Hi {{nope}}", "markdown")
+    assert template.check([group("First")]) == "No value for {{nope}} in First."
+    with pytest.raises(KeyError):
+        template.render(group())
+
+def test_check_counts_the_rendered_length():
+    template = MessageTemplate("x" * (MAX_MESSAGE_LENGTH - 2) + "{{title}}", "plain")
+    assert template.check([group("ab")]) is None
+    assert template.check([group("ab"), group("😀b")]) == \
+        f"The message for 😀b is {MAX_MESSAGE_LENGTH + 1} characters; Telegram allows {MAX_MESSAGE_LENGTH}."
+
+def test_static_message_is_checked_without_targets():
+    assert check_template("   ", "markdown", None, []) == "The message is empty."
+    assert check_template("**Hi**", "markdown", None, []) is None
+    assert check_template("", "markdown", None, [], attachments=["photo.jpg"]) is None